@@ -0,0 +1,317 @@
+"""
+Headless resolve-and-detect over a corpus, for regression-testing a new
+detector, hint table or label index without the chat window.
+
+Every query is resolved to a label once (SmartLLMEngine, all tiers); every
+screenshot is run through the detector once, in a process pool, and then
+checked for each query's label. One JSON line per query ("kind": "resolve")
+and per image ("kind": "image") goes to the output, chunk by chunk, so an
+interrupted run picks up where it stopped when started again with the same
+output file. Images that failed, or were checked for a different set of
+queries than this run's, are run again on resume, so an image can have
+several records: the last one wins. Every run ends with a "kind": "summary"
+line computed that way over the images in this run.
+
+    python batch_run.py --queries queries.txt --images shots/ --out results.jsonl --workers 8
+    python batch_run.py --images screenshots/ --detector local --out results.jsonl
+
+The queries file has one query per line ('#' starts a comment). Without
+one, each image needs a <name>.json next to it with a "query" (the
+screenshot archive writes those).
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from detector_backends import get_backend
+from roboflow_detect import detect_objects
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_LABELS = os.path.join(HERE, "..", "assets", "label_mapping.txt")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".npy")
+
+
+# -------------------------
+# Inputs
+# -------------------------
+def load_queries(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def list_images(directory):
+    """Image paths under `directory`, relative to it and sorted, so runs are repeatable."""
+    found = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(found)
+
+
+def query_set_id(queries):
+    """Short id of a set of queries, stored in each image record to spot a changed query file on resume."""
+    return hashlib.sha1("\n".join(sorted(set(queries))).encode("utf-8")).hexdigest()[:12]
+
+
+def sidecar_query(directory, image):
+    path = os.path.join(directory, os.path.splitext(image)[0] + ".json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("query")
+
+
+# -------------------------
+# Resumable output
+# -------------------------
+def read_records(path):
+    """
+    (resolve records by query, image records by image) in the output, the
+    last record winning for both. A line cut off by an interrupted run is
+    truncated away.
+    """
+    queries, images = {}, {}
+    if not os.path.exists(path):
+        return queries, images
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+    for line in data[:end].decode("utf-8").splitlines():
+        record = json.loads(line)
+        if record.get("kind") == "resolve":
+            queries[record["query"]] = record
+        elif record.get("kind") == "image":
+            images[record["image"]] = record
+    return queries, images
+
+
+def load_done(path):
+    """
+    (resolved queries, {finished image: its query set id}); images whose
+    last record is an error are left out, so they are tried again.
+    """
+    queries, images = read_records(path)
+    return queries, {image: record.get("query_set") for image, record in images.items() if "error" not in record}
+
+
+def summarize(path, only=None):
+    """Totals over the output, counting only the last record of each image (of those in `only`, if given)."""
+    _, images = read_records(path)
+    if only is not None:
+        images = {image: record for image, record in images.items() if image in only}
+    summary = {"kind": "summary", "images": len(images), "errors": 0, "found": 0, "checked": 0}
+    detect_ms = []
+    for record in images.values():
+        if "error" in record:
+            summary["errors"] += 1
+            continue
+        detect_ms.append(record["detect_ms"])
+        summary["checked"] += len(record["results"])
+        summary["found"] += sum(1 for r in record["results"] if r["found"])
+    detect_ms.sort()
+    summary["detect_p50_ms"] = detect_ms[len(detect_ms) // 2] if detect_ms else None
+    summary["detect_p95_ms"] = detect_ms[min(len(detect_ms) - 1, int(len(detect_ms) * 0.95))] if detect_ms else None
+    return summary
+
+
+def append_records(f, records):
+    for record in records:
+        f.write(json.dumps(record) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+# -------------------------
+# Label resolution (parent process; the engine caches and rate-limits Gemma)
+# -------------------------
+def resolve_queries(queries, label_path, matcher, offline):
+    from llm_engine import SmartLLMEngine
+    from query_cache import QueryCache
+    engine = SmartLLMEngine(label_list_path=label_path, matcher=matcher, cache=QueryCache())
+    if offline:
+        engine.model.disable("offline run")
+    for query in queries:
+        start = time.perf_counter()
+        result = engine.query(query)
+        yield {
+            "kind": "resolve",
+            "query": query,
+            "label": result.get("label"),
+            "tab": result.get("tabs"),
+            "tab_label": result.get("tab_label"),
+            "source": result.get("source"),
+            "candidates": [[label, score] for label, score in result.get("candidates", [])],
+            "ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+
+# -------------------------
+# Detection (worker processes)
+# -------------------------
+_worker = {}
+
+
+def _init_worker(image_dir, detector, confidence, roi, tile, targets):
+    _worker.update(image_dir=image_dir, backend=get_backend(detector), confidence=confidence,
+                   roi=roi, tile=tile, targets=targets)
+
+
+def _read_image(path):
+    if path.endswith(".npy"):
+        return np.load(path)
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError("unreadable image")
+    return image
+
+
+def _run_chunk(chunk):
+    """Detect everything in each (image, queries) item, then look up every query's label."""
+    records = []
+    for image, queries in chunk:
+        record = {"kind": "image", "image": image, "query_set": query_set_id(queries), "pid": os.getpid()}
+        try:
+            start = time.perf_counter()
+            pixels = _read_image(os.path.join(_worker["image_dir"], image))
+            record["load_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+            start = time.perf_counter()
+            detections = detect_objects(pixels, confidence=_worker["confidence"], backend=_worker["backend"],
+                                        roi=_worker["roi"], tile=_worker["tile"])
+            record["detect_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            record["size"] = [pixels.shape[1], pixels.shape[0]]
+            record["detections"] = len(detections)
+
+            by_label = {}
+            for d in detections:
+                by_label.setdefault(d["label"], []).append(d["box"] + [round(d["confidence"], 4)])
+            results = []
+            for query in queries:
+                label, tab_label = _worker["targets"].get(query, (None, None))
+                hits = by_label.get(label, [])
+                results.append({
+                    "query": query,
+                    "label": label,
+                    "found": bool(hits),
+                    "boxes": hits,
+                    # Not on screen, but its tab header is: the app would point there first
+                    "tab_found": not hits and tab_label in by_label,
+                })
+            record["results"] = results
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        records.append(record)
+    return records
+
+
+# -------------------------
+# Driver
+# -------------------------
+def run_batch(image_dir, out_path, queries=None, label_path=DEFAULT_LABELS, matcher="lexical", offline=False,
+              detector=None, confidence=0.5, roi=True, tile=False, workers=1, chunk_size=16, report=print):
+    images = list_images(image_dir)
+    if queries is None:
+        items = [(image, [q] if q else []) for image, q in ((im, sidecar_query(image_dir, im)) for im in images)]
+    else:
+        items = [(image, queries) for image in images]
+
+    # Load the detector here first: one that can't load fails with its own
+    # error rather than as a broken process pool
+    try:
+        get_backend(detector)
+    except Exception as e:
+        raise RuntimeError(f"Detector backend '{detector or os.environ.get('URA_DETECTOR', 'roboflow')}' "
+                           f"could not be loaded: {e}") from e
+
+    done_queries, done_images = load_done(out_path)
+    all_queries = list(dict.fromkeys(q for _, qs in items for q in qs))
+    # Images checked for other queries (the queries file changed) are run again
+    todo = [item for item in items if done_images.get(item[0], "") != query_set_id(item[1])]
+    rerun = sum(1 for image, _ in todo if image in done_images)
+    report(f"{len(images)} images, {len(all_queries)} queries; "
+           f"{len(images) - len(todo)} images already done"
+           + (f", {rerun} to redo for changed queries" if rerun else ""))
+
+    ran = {"images": 0, "errors": 0}
+    with open(out_path, "a", encoding="utf-8") as out:
+        new = [q for q in all_queries if q not in done_queries]
+        for record in resolve_queries(new, label_path, matcher, offline) if new else []:
+            append_records(out, [record])
+            done_queries[record["query"]] = record
+        targets = {q: (r["label"], r["tab_label"]) for q, r in done_queries.items()}
+
+        chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+        initargs = (image_dir, detector, confidence, roi, tile, targets)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+                for future in as_completed([pool.submit(_run_chunk, chunk) for chunk in chunks]):
+                    _finish_chunk(out, future.result(), ran, report)
+        else:
+            _init_worker(*initargs)
+            for chunk in chunks:
+                _finish_chunk(out, _run_chunk(chunk), ran, report)
+
+    # Over the whole file, so a resumed run reports on every image, not just this run's
+    summary = summarize(out_path, only=set(images))
+    summary["run"] = ran
+    with open(out_path, "a", encoding="utf-8") as out:
+        append_records(out, [summary])
+    return summary
+
+
+def _finish_chunk(out, records, ran, report):
+    # Written as soon as a chunk is done, so an interrupted run loses at most the chunks in flight
+    append_records(out, records)
+    for record in records:
+        ran["images"] += 1
+        if "error" in record:
+            ran["errors"] += 1
+            report(f"❌ {record['image']}: {record['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve queries and detect labels over a screenshot corpus")
+    parser.add_argument("--images", required=True, help="directory of Word screenshots")
+    parser.add_argument("--queries", help="text file with one query per line (default: each image's .json)")
+    parser.add_argument("--out", required=True, help="JSONL output; an existing file is resumed")
+    parser.add_argument("--labels", default=DEFAULT_LABELS)
+    parser.add_argument("--matcher", default="lexical", help="lexical, semantic or hybrid")
+    parser.add_argument("--offline", action="store_true", help="never call Gemma; tabs come from the tab index")
+    parser.add_argument("--detector", help="detector backend (default: $URA_DETECTOR, else roboflow)")
+    parser.add_argument("--confidence", type=float, default=0.5)
+    parser.add_argument("--no-roi", action="store_true", help="send the full image to the detector")
+    parser.add_argument("--tile", action="store_true", help="tile the ribbon band")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="detection processes")
+    parser.add_argument("--chunk-size", type=int, default=16, help="images per work unit")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        summary = run_batch(
+            args.images, args.out, queries=load_queries(args.queries) if args.queries else None,
+            label_path=args.labels, matcher=args.matcher, offline=args.offline, detector=args.detector,
+            confidence=args.confidence, roi=not args.no_roi, tile=args.tile, workers=args.workers,
+            chunk_size=args.chunk_size,
+        )
+    except RuntimeError as e:
+        print("❌", e)
+        raise SystemExit(1)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {summary['run']['images']} images run in {elapsed:.1f}s ({summary['run']['errors']} failed); "
+          f"{summary['images']} in the output ({summary['errors']} failed), "
+          f"{summary['found']}/{summary['checked']} query labels found; "
+          f"detect p50 {summary['detect_p50_ms']} ms  p95 {summary['detect_p95_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Headless end-to-end latency benchmark for the question -> label -> capture
+-> detect -> overlay pipeline. Runs the real SmartLLMEngine, AssistantPipeline,
+detect_objects post-processing and overlay box scaling; window lookup, screen
+grab, Ollama and the detector are local fakes with configurable latency, so it
+runs on any machine without Word, Ollama or network.
+
+    python benchmark.py --runs 100 --llm-latency 0.3 --detect-latency 0.05 --json bench.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from capture_backends import SyntheticBackend
+from detection_cache import DetectionCache
+from detector_backends import FakeBackend
+from fake_ollama import FakeOllamaServer
+from frame import scale_box, synthetic_word_frame
+from llm_engine import SmartLLMEngine
+from ollama_client import OllamaHTTPClient
+from pipeline import AssistantPipeline, CancelToken
+from query_cache import QueryCache
+from roboflow_detect import detect_objects
+from screenshot_archive import ScreenshotArchive
+from screen_capture import grab_word_frame
+from window_provider import FakeWindowProvider
+
+
+DEFAULT_QUERIES = [
+    "how to make text bold",
+    "insert a table",
+    "add a chart",
+    "check spelling",
+    "change font size",
+    "add page numbers",
+    "insert header",
+    "set margins",
+    "track changes",
+    "find and replace text",
+    "change text color",
+    "insert picture",
+]
+
+STAGES = ["window_lookup", "llm", "capture", "detect", "overlay_scale", "total"]
+
+
+def default_label_path():
+    here = os.path.dirname(os.path.abspath(__file__))
+    path = os.path.join(here, "..", "assets", "label_mapping.txt")
+    return path if os.path.exists(path) else "label_mapping.txt"
+
+
+def percentile(sorted_samples, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, max(0, int(round(q / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else None,
+        "p50_ms": round(percentile(ordered, 50), 3) if ordered else None,
+        "p95_ms": round(percentile(ordered, 95), 3) if ordered else None,
+        "p99_ms": round(percentile(ordered, 99), 3) if ordered else None,
+    }
+
+
+def ribbon_predictions(labels, width=1920, ribbon_height=190):
+    """One fake prediction per label, laid out in rows across the ribbon band."""
+    predictions = []
+    per_row = max(1, (width - 20) // 30)
+    for i, label in enumerate(labels):
+        row, col = divmod(i, per_row)
+        predictions.append({
+            'class': label,
+            'x': 20 + col * 30, 'y': 50 + (row * 30) % (ribbon_height - 60),
+            'width': 24, 'height': 24,
+            'confidence': 0.6 + (i % 40) / 100,
+        })
+    return predictions
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {name: [] for name in STAGES}
+
+    def record(self, name, start):
+        self.samples[name].append((time.perf_counter() - start) * 1000)
+
+    def wrap(self, name, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, start)
+        return timed
+
+
+class _TimedEngine:
+    def __init__(self, engine, timer):
+        self.query = timer.wrap("llm", engine.query)
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.decode().strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def run_benchmark(runs=50, queries=None, llm_latency=0.0, detect_latency=0.0, capture_latency=0.0,
+                  window_latency=0.0, use_cache=False, roi=True, tile=False, warmup=3, label_path=None,
+                  speculative=False, archive_format=None):
+    queries = queries or DEFAULT_QUERIES
+    timer = StageTimer()
+
+    with FakeOllamaServer(latency=llm_latency, response='{"tab": "Home"}') as server:
+        engine = SmartLLMEngine(
+            label_list_path=label_path or default_label_path(),
+            client=OllamaHTTPClient(host=server.url),
+            cache=QueryCache() if use_cache else QueryCache(max_memory=0),
+        )
+        backend = FakeBackend(predictions=ribbon_predictions(engine.labels), latency=detect_latency)
+        detection_cache = DetectionCache() if use_cache else None
+        base_image = synthetic_word_frame()
+        overlay_size = (1600, 866)
+        windows = FakeWindowProvider()
+        windows.add_window(rect=(0, 0, base_image.shape[1], base_image.shape[0]))
+        screen = SyntheticBackend(base_image, latency=capture_latency)
+
+        def find_window():
+            time.sleep(window_latency)
+            return windows.find_target()
+
+        def capture(hwnd):
+            return grab_word_frame(hwnd, windows=windows, backend=screen)
+
+        def detect(frame, labels):
+            return detect_objects(frame, filter_labels=labels, backend=backend, cache=detection_cache,
+                                  roi=roi, tile=tile)
+
+        def scale_boxes(result):
+            return [scale_box(d['box'], result["frame"].size, overlay_size) for d in result["detections"]]
+
+        archive_dir = tempfile.mkdtemp(prefix="ura_archive_") if archive_format else None
+        pipeline = AssistantPipeline(
+            engine=_TimedEngine(engine, timer),
+            capture=timer.wrap("capture", capture),
+            detect=timer.wrap("detect", detect),
+            archive=ScreenshotArchive(archive_dir, capacity=20, encoding=archive_format) if archive_dir else None,
+            speculative=speculative,
+        )
+        lookup = timer.wrap("window_lookup", find_window)
+        overlay = timer.wrap("overlay_scale", scale_boxes)
+
+        def one_query(text):
+            start = time.perf_counter()
+            hwnd = lookup()
+            result = pipeline.run(text, hwnd, CancelToken(), lambda _: None)
+            if "detections" in result:
+                overlay(result)
+            timer.record("total", start)
+            return result
+
+        for i in range(warmup):
+            one_query(queries[i % len(queries)])
+        timer.samples = {name: [] for name in STAGES}
+
+        unmatched = 0
+        engine.resolved = dict.fromkeys(engine.resolved, 0)
+        wall_start = time.perf_counter()
+        for i in range(runs):
+            if "detections" not in one_query(queries[i % len(queries)]):
+                unmatched += 1
+        wall = time.perf_counter() - wall_start
+        if pipeline.archive is not None:
+            pipeline.archive.close()
+            archived = {"written": pipeline.archive.written, "dropped": pipeline.archive.dropped}
+            shutil.rmtree(archive_dir, ignore_errors=True)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "runs": runs, "queries": len(queries), "llm_latency_s": llm_latency,
+            "detect_latency_s": detect_latency, "capture_latency_s": capture_latency,
+            "window_latency_s": window_latency, "cache": use_cache, "roi": roi, "tile": tile,
+            "speculative": speculative, "archive": archive_format,
+        },
+        "stages": {name: summarize(samples) for name, samples in timer.samples.items()},
+        "throughput_qps": round(runs / wall, 2) if wall > 0 else None,
+        "unmatched": unmatched,
+        "resolved": dict(engine.resolved),
+        "llm_queue": engine.scheduler.metrics(),
+        "archive": archived if archive_format else None,
+    }
+
+
+def print_report(report):
+    print(f"{'stage':<15}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for name in STAGES:
+        s = report["stages"][name]
+        if not s["count"]:
+            continue
+        print(f"{name:<15}{s['count']:>7}{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+    print(f"throughput: {report['throughput_qps']} queries/s   unmatched: {report['unmatched']}")
+    print("resolved by: " + ", ".join(f"{name} {n}" for name, n in report["resolved"].items()))
+    queue = report["llm_queue"]
+    print(f"llm queue: max depth {queue['max_depth']}, coalesced {queue['coalesced']}, "
+          f"wait p95 {queue['wait']['p95_ms']} ms")
+    if report["archive"]:
+        print(f"archive: {report['archive']['written']} written, {report['archive']['dropped']} dropped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless latency benchmark for the URA pipeline")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--queries", help="text file with one query per line")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="fake Ollama latency (s)")
+    parser.add_argument("--detect-latency", type=float, default=0.0, help="fake detector latency (s)")
+    parser.add_argument("--capture-latency", type=float, default=0.0, help="fake screen grab latency (s)")
+    parser.add_argument("--window-latency", type=float, default=0.0, help="fake window lookup latency (s)")
+    parser.add_argument("--cache", action="store_true", help="enable the query and detection caches")
+    parser.add_argument("--no-roi", action="store_true", help="send the full frame to the detector")
+    parser.add_argument("--tile", action="store_true", help="tile the ribbon band")
+    parser.add_argument("--speculative", action="store_true", help="capture and detect while the LLM runs")
+    parser.add_argument("--archive", choices=["jpg", "webp", "png", "npy"],
+                        help="archive every frame in this format (to a temp dir)")
+    parser.add_argument("--labels", help="path to label_mapping.txt")
+    parser.add_argument("--json", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    queries = None
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    report = run_benchmark(
+        runs=args.runs, queries=queries, llm_latency=args.llm_latency, detect_latency=args.detect_latency,
+        capture_latency=args.capture_latency, window_latency=args.window_latency, use_cache=args.cache,
+        roi=not args.no_roi, tile=args.tile, label_path=args.labels,
+        speculative=args.speculative, archive_format=args.archive,
+    )
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+# -------------------------
+# Backend interface
+# -------------------------
+class CaptureBackend:
+    """
+    A screen grabber. `grab((x1, y1, x2, y2))` returns that screen rectangle
+    as a BGR ndarray. To avoid per-grab allocations the result is a view
+    into a buffer owned by the calling thread, valid until that thread's
+    next grab; call .copy() to keep it longer.
+
+    `excludes_layered` tells whether translucent (layered) windows such as
+    the chat window and the overlay are left out of the grab by the capture
+    method itself, so they don't need hiding first.
+    """
+
+    name = "base"
+    excludes_layered = False
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def open(self):
+        """Load libraries / handles. Called once, before the first grab."""
+
+    def close(self):
+        """Release OS resources."""
+
+    def grab(self, bbox):
+        raise NotImplementedError
+
+    def _bgr_buffer(self, width, height):
+        """This thread's reusable BGR buffer, grown as needed; returns a width x height view."""
+        buf = getattr(self._local, "bgr", None)
+        if buf is None or buf.shape[0] < height or buf.shape[1] < width:
+            buf = np.empty((max(height, buf.shape[0] if buf is not None else 0),
+                            max(width, buf.shape[1] if buf is not None else 0), 3), np.uint8)
+            self._local.bgr = buf
+        return buf[:height, :width]
+
+
+# -------------------------
+# Native GDI grabber (Windows)
+# -------------------------
+SRCCOPY = 0x00CC0020
+DIB_RGB_COLORS = 0
+BI_RGB = 0
+
+
+class GDIBackend(CaptureBackend):
+    """
+    BitBlt from the screen into a 32-bit DIB section that numpy reads in
+    place, then a single BGRA->BGR conversion into the reused output
+    buffer. Each thread keeps its own DCs and DIB, grown to the largest
+    rectangle seen. Without CAPTUREBLT, layered windows are not copied.
+    """
+
+    name = "gdi"
+    excludes_layered = True
+
+    def __init__(self):
+        super().__init__()
+        self._resources = []
+        self._resources_lock = threading.Lock()
+
+    def open(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class BITMAPINFOHEADER(ctypes.Structure):
+            _fields_ = [("biSize", wintypes.DWORD), ("biWidth", wintypes.LONG), ("biHeight", wintypes.LONG),
+                        ("biPlanes", wintypes.WORD), ("biBitCount", wintypes.WORD),
+                        ("biCompression", wintypes.DWORD), ("biSizeImage", wintypes.DWORD),
+                        ("biXPelsPerMeter", wintypes.LONG), ("biYPelsPerMeter", wintypes.LONG),
+                        ("biClrUsed", wintypes.DWORD), ("biClrImportant", wintypes.DWORD)]
+
+        self._ctypes = ctypes
+        self._header_type = BITMAPINFOHEADER
+        self.user32 = ctypes.windll.user32
+        self.gdi32 = ctypes.windll.gdi32
+        handle = ctypes.c_void_p
+        self.user32.GetDC.restype = handle
+        self.user32.GetDC.argtypes = [handle]
+        self.user32.ReleaseDC.argtypes = [handle, handle]
+        self.gdi32.CreateCompatibleDC.restype = handle
+        self.gdi32.CreateCompatibleDC.argtypes = [handle]
+        self.gdi32.CreateDIBSection.restype = handle
+        self.gdi32.CreateDIBSection.argtypes = [handle, ctypes.c_void_p, wintypes.UINT,
+                                                ctypes.POINTER(ctypes.c_void_p), handle, wintypes.DWORD]
+        self.gdi32.SelectObject.restype = handle
+        self.gdi32.SelectObject.argtypes = [handle, handle]
+        self.gdi32.DeleteObject.argtypes = [handle]
+        self.gdi32.DeleteDC.argtypes = [handle]
+        self.gdi32.BitBlt.argtypes = [handle, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                      handle, ctypes.c_int, ctypes.c_int, wintypes.DWORD]
+
+    def _surface(self, width, height):
+        """This thread's (memory DC, BGRA array), reallocated only when too small."""
+        ctypes = self._ctypes
+        local = self._local
+        surface = getattr(local, "surface", None)
+        if surface and surface["width"] >= width and surface["height"] >= height:
+            return surface
+        if surface:
+            self._release(surface)
+
+        width = max(width, surface["width"] if surface else 0)
+        height = max(height, surface["height"] if surface else 0)
+        screen_dc = self.user32.GetDC(None)
+        mem_dc = self.gdi32.CreateCompatibleDC(screen_dc)
+        header = self._header_type(biSize=ctypes.sizeof(self._header_type), biWidth=width, biHeight=-height,
+                                   biPlanes=1, biBitCount=32, biCompression=BI_RGB)
+        bits = ctypes.c_void_p()
+        bitmap = self.gdi32.CreateDIBSection(mem_dc, ctypes.byref(header), DIB_RGB_COLORS, ctypes.byref(bits),
+                                             None, 0)
+        if not bitmap:
+            self.gdi32.DeleteDC(mem_dc)
+            self.user32.ReleaseDC(None, screen_dc)
+            raise OSError("CreateDIBSection failed")
+        old = self.gdi32.SelectObject(mem_dc, bitmap)
+        raw = (ctypes.c_ubyte * (width * height * 4)).from_address(bits.value)
+        surface = {
+            "width": width, "height": height, "screen_dc": screen_dc, "mem_dc": mem_dc,
+            "bitmap": bitmap, "old": old, "pixels": np.ctypeslib.as_array(raw).reshape(height, width, 4),
+        }
+        local.surface = surface
+        with self._resources_lock:
+            self._resources.append(surface)
+        return surface
+
+    def _release(self, surface):
+        self.gdi32.SelectObject(surface["mem_dc"], surface["old"])
+        self.gdi32.DeleteObject(surface["bitmap"])
+        self.gdi32.DeleteDC(surface["mem_dc"])
+        self.user32.ReleaseDC(None, surface["screen_dc"])
+        with self._resources_lock:
+            if surface in self._resources:
+                self._resources.remove(surface)
+
+    def close(self):
+        with self._resources_lock:
+            surfaces = list(self._resources)
+        for surface in surfaces:
+            self._release(surface)
+
+    def grab(self, bbox):
+        x1, y1, x2, y2 = [int(v) for v in bbox]
+        width, height = x2 - x1, y2 - y1
+        if width <= 0 or height <= 0:
+            return None
+        surface = self._surface(width, height)
+        if not self.gdi32.BitBlt(surface["mem_dc"], 0, 0, width, height, surface["screen_dc"], x1, y1, SRCCOPY):
+            raise OSError("BitBlt failed")
+        self.gdi32.GdiFlush()
+        return cv2.cvtColor(surface["pixels"][:height, :width], cv2.COLOR_BGRA2BGR,
+                            dst=self._bgr_buffer(width, height))
+
+
+# -------------------------
+# mss (optional dependency)
+# -------------------------
+class MSSBackend(CaptureBackend):
+    """The `mss` package (pip install mss); one instance per thread, as mss requires."""
+
+    name = "mss"
+
+    def open(self):
+        import mss  # noqa: F401
+
+    def grab(self, bbox):
+        import mss
+        x1, y1, x2, y2 = [int(v) for v in bbox]
+        width, height = x2 - x1, y2 - y1
+        if width <= 0 or height <= 0:
+            return None
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = self._local.sct = mss.mss()
+        shot = sct.grab({"left": x1, "top": y1, "width": width, "height": height})
+        bgra = np.frombuffer(shot.raw, np.uint8).reshape(shot.height, shot.width, 4)
+        return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=self._bgr_buffer(shot.width, shot.height))
+
+
+# -------------------------
+# PIL ImageGrab
+# -------------------------
+class PILBackend(CaptureBackend):
+    """PIL.ImageGrab, the original capture path; works wherever Pillow can grab the screen."""
+
+    name = "pil"
+    # Grabs without CAPTUREBLT on Windows (include_layered_windows=False)
+    excludes_layered = sys.platform == "win32"
+
+    def open(self):
+        from PIL import ImageGrab  # noqa: F401
+
+    def grab(self, bbox):
+        from PIL import ImageGrab
+        img = ImageGrab.grab(bbox=tuple(int(v) for v in bbox))
+        rgb = np.asarray(img)
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=self._bgr_buffer(rgb.shape[1], rgb.shape[0]))
+
+
+# -------------------------
+# Synthetic screen for tests and benchmarks
+# -------------------------
+class SyntheticBackend(CaptureBackend):
+    """
+    Serves rectangles of a fixed BGR "screen" image (default: a synthetic
+    Word window at (0, 0)) as views, after an optional simulated `latency`.
+    Area outside the image comes back black.
+    """
+
+    name = "synthetic"
+    excludes_layered = True
+
+    def __init__(self, image=None, latency=0.0):
+        super().__init__()
+        self.image = image
+        self.latency = latency
+        self.calls = 0
+
+    def open(self):
+        if self.image is None:
+            from frame import synthetic_word_frame
+            self.image = synthetic_word_frame()
+
+    def grab(self, bbox):
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls += 1
+        x1, y1, x2, y2 = [int(v) for v in bbox]
+        height, width = self.image.shape[:2]
+        if x2 <= x1 or y2 <= y1:
+            return None
+        if 0 <= x1 and 0 <= y1 and x2 <= width and y2 <= height:
+            return self.image[y1:y2, x1:x2]
+        out = self._bgr_buffer(x2 - x1, y2 - y1)
+        out[:] = 0
+        sx1, sy1, sx2, sy2 = max(x1, 0), max(y1, 0), min(x2, width), min(y2, height)
+        if sx2 > sx1 and sy2 > sy1:
+            out[sy1 - y1:sy2 - y1, sx1 - x1:sx2 - x1] = self.image[sy1:sy2, sx1:sx2]
+        return out
+
+
+BACKENDS = {
+    "gdi": GDIBackend,
+    "mss": MSSBackend,
+    "pil": PILBackend,
+    "synthetic": SyntheticBackend,
+}
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def get_capture_backend(name=None):
+    """
+    Return the opened backend called `name` (default: $URA_CAPTURE, else
+    "gdi" on Windows and "synthetic" elsewhere). Each backend is created
+    and opened once, then reused.
+    """
+    name = name or os.environ.get("URA_CAPTURE") or ("gdi" if sys.platform == "win32" else "synthetic")
+    with _loaded_lock:
+        backend = _loaded.get(name)
+        if backend is None:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown capture backend '{name}' (choose from {', '.join(BACKENDS)})")
+            backend = BACKENDS[name]()
+            backend.open()
+            _loaded[name] = backend
+    return backend
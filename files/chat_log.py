@@ -0,0 +1,202 @@
+import itertools
+import json
+import os
+import time
+from collections import OrderedDict
+
+from PyQt5.QtWidgets import QApplication, QListView, QStyledItemDelegate, QStyle, QAbstractItemView
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QRectF, QSize, QPointF, QTimer
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QPainter, QPen, QBrush, QStaticText, QTextOption, QKeySequence
+
+# Custom item roles
+IsUserRole = Qt.UserRole + 1
+MessageIdRole = Qt.UserRole + 2
+
+_ids = itertools.count(1)
+
+
+# -------------------------
+# Model
+# -------------------------
+class ChatHistory(QAbstractListModel):
+    """
+    The chat messages, oldest first. Only the newest `max_messages` are
+    kept; older ones are dropped in batches and, with `spill_path`, appended
+    to that file as JSON lines first.
+    """
+
+    def __init__(self, max_messages=1000, spill_path=None, parent=None):
+        super().__init__(parent)
+        self.max_messages = max_messages
+        self.spill_path = spill_path
+        self.spilled = 0
+        self._messages = []  # [id, text, is_user, timestamp]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        msg_id, text, is_user, _ = self._messages[index.row()]
+        if role == Qt.DisplayRole:
+            return text
+        if role == IsUserRole:
+            return is_user
+        if role == MessageIdRole:
+            return msg_id
+        return None
+
+    def append(self, text, is_user=False):
+        row = len(self._messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._messages.append([next(_ids), text, is_user, time.time()])
+        self.endInsertRows()
+        self._trim()
+
+    def _trim(self):
+        # Drop a tenth of the cap at once so trimming isn't paid per message
+        excess = len(self._messages) - self.max_messages
+        if excess <= 0:
+            return
+        count = excess + self.max_messages // 10
+        old = self._messages[:count]
+        if self.spill_path:
+            self._spill(old)
+        self.beginRemoveRows(QModelIndex(), 0, count - 1)
+        del self._messages[:count]
+        self.endRemoveRows()
+
+    def _spill(self, messages):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for _, text, is_user, ts in messages:
+                    f.write(json.dumps({"time": ts, "user": is_user, "text": text}, ensure_ascii=False) + "\n")
+            self.spilled += len(messages)
+        except OSError as e:
+            print("❌ Chat history spill failed:", e)
+
+
+# -------------------------
+# Delegate
+# -------------------------
+class ChatBubbleDelegate(QStyledItemDelegate):
+    """
+    Paints each message as a rounded bubble. The wrapped text layout and
+    bubble size are computed once per (message, width) and cached, so
+    scrolling and repaints only draw.
+    """
+    MARGIN = 6
+    PADDING = 10
+    INDENT = 80  # free space on the side opposite the sender
+    USER_BG = QColor("#4b6ef6")
+    USER_FG = QColor("white")
+    BOT_BG = QColor("#2e2e2e")
+    BOT_FG = QColor("#eaeaea")
+
+    def __init__(self, parent=None, font=None, max_cached=4096):
+        super().__init__(parent)
+        self.font = font or QFont("Segoe UI", 10)
+        self.metrics = QFontMetrics(self.font)
+        self.max_cached = max_cached
+        self._layouts = OrderedDict()  # (id, width) -> (QStaticText, QSize)
+        self._user_pen, self._bot_pen = QPen(self.USER_FG), QPen(self.BOT_FG)
+        self._user_brush, self._bot_brush = QBrush(self.USER_BG), QBrush(self.BOT_BG)
+        self._selected_pen = QPen(QColor("#9ca3af"), 1)
+
+    def _width(self, option):
+        # The list lays items out at the viewport width
+        view = self.parent()
+        return view.viewport().width() if view is not None else option.rect.width()
+
+    def _layout(self, index, width):
+        key = (index.data(MessageIdRole), width)
+        cached = self._layouts.get(key)
+        if cached is not None:
+            self._layouts.move_to_end(key)
+            return cached
+
+        text = index.data(Qt.DisplayRole)
+        max_text = max(40, width - self.INDENT - 2 * (self.MARGIN + self.PADDING))
+        bounds = self.metrics.boundingRect(QRect(0, 0, max_text, 1 << 20), Qt.TextWordWrap, text)
+        static = QStaticText(text)
+        static.setTextFormat(Qt.PlainText)
+        static.setTextWidth(bounds.width() + 1)
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WordWrap)
+        static.setTextOption(option)
+        static.prepare(font=self.font)
+        cached = (static, QSize(bounds.width() + 1, bounds.height()))
+
+        self._layouts[key] = cached
+        if len(self._layouts) > self.max_cached:
+            self._layouts.popitem(last=False)
+        return cached
+
+    def sizeHint(self, option, index):
+        width = self._width(option)
+        _, text_size = self._layout(index, width)
+        return QSize(width, text_size.height() + 2 * (self.MARGIN + self.PADDING))
+
+    def paint(self, painter, option, index):
+        is_user = index.data(IsUserRole)
+        static, text_size = self._layout(index, self._width(option))
+        bubble_w = text_size.width() + 2 * self.PADDING
+        bubble_h = text_size.height() + 2 * self.PADDING
+        rect = option.rect
+        x = rect.right() - self.MARGIN - bubble_w if is_user else rect.left() + self.MARGIN
+        bubble = QRectF(x, rect.top() + self.MARGIN, bubble_w, bubble_h)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        selected = option.state & QStyle.State_Selected
+        painter.setPen(self._selected_pen if selected else Qt.NoPen)
+        painter.setBrush(self._user_brush if is_user else self._bot_brush)
+        painter.drawRoundedRect(bubble, 12, 12)
+        painter.setFont(self.font)
+        painter.setPen(self._user_pen if is_user else self._bot_pen)
+        painter.drawStaticText(QPointF(bubble.left() + self.PADDING, bubble.top() + self.PADDING), static)
+        painter.restore()
+
+
+# -------------------------
+# View
+# -------------------------
+class ChatView(QListView):
+    """
+    Chat log view: only visible rows are painted, and new messages scroll
+    into view only when the log was already at the bottom. Ctrl+C copies
+    the selected message.
+    """
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setItemDelegate(ChatBubbleDelegate(self))
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setResizeMode(QListView.Adjust)
+        self.setWordWrap(True)
+        self.setStyleSheet("background: transparent; border: none;")
+        self.verticalScrollBar().setSingleStep(12)
+
+        self._follow = True
+        model.rowsAboutToBeInserted.connect(self._remember_follow)
+        model.rowsInserted.connect(self._scroll_if_following)
+
+    def _remember_follow(self, *args):
+        bar = self.verticalScrollBar()
+        self._follow = bar.value() >= bar.maximum() - 4
+
+    def _scroll_if_following(self, *args):
+        if self._follow:
+            # After the view has laid out the new row
+            QTimer.singleShot(0, self.scrollToBottom)
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy) and self.currentIndex().isValid():
+            QApplication.clipboard().setText(self.currentIndex().data(Qt.DisplayRole))
+            return
+        super().keyPressEvent(event)
@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from roi import find_ribbon_band
+
+
+def ribbon_hash(image, band=None, hash_size=(128, 32), partial=False):
+    """
+    Difference hash of the ribbon of a BGR frame: the band found by
+    roi.find_ribbon_band, the top `band` fraction if given, or the whole
+    image for a `partial` (ribbon-only) grab. Returns an int with
+    hash_size[0] * hash_size[1] bits. The grid is fine enough (cells of
+    about 15x6 px on a 1920 px wide ribbon) that one changed 24x24 icon
+    flips several bits, while re-grabbing an unchanged ribbon flips none.
+    """
+    if partial:
+        band_px = image.shape[0]
+    elif band is not None:
+        band_px = max(1, int(image.shape[0] * band))
+    else:
+        # Every 4th column is plenty to find the border row, at a quarter of the cost
+        band_px = find_ribbon_band(image[:, ::4])[1]
+    gray = cv2.cvtColor(image[:band_px], cv2.COLOR_BGR2GRAY)
+    width, height = hash_size
+    small = cv2.resize(gray, (width + 1, height), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class DetectionCache:
+    """
+    Remembers the full prediction list (every label, not just the one asked
+    about) for recently seen ribbons. A frame whose ribbon hash is within
+    `max_distance` bits of a cached one, at the same window size,
+    confidence and detection mode (roi, tile), reuses those predictions
+    instead of running the detector. Keep `max_distance` small: a
+    contextual button appearing moves the hash by only a handful of bits.
+    """
+
+    def __init__(self, max_entries=16, max_distance=1, band=None):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.band = band
+        self._entries = OrderedDict()  # (hash, size, confidence, mode) -> predictions
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, image, confidence, roi=False, tile=False, partial=False):
+        size = (image.shape[1], image.shape[0])
+        return ribbon_hash(image, band=self.band, partial=partial), size, confidence, (roi, tile)
+
+    def get(self, key):
+        frame_hash, rest = key[0], key[1:]
+        with self._lock:
+            for cached_key in reversed(self._entries):
+                if cached_key[1:] != rest:
+                    continue
+                cached_hash = cached_key[0]
+                if (cached_hash ^ frame_hash).bit_count() <= self.max_distance:
+                    self._entries.move_to_end(cached_key)
+                    self.hits += 1
+                    return [dict(p) for p in self._entries[cached_key]]
+            self.misses += 1
+            return None
+
+    def put(self, key, predictions):
+        with self._lock:
+            self._entries[key] = [dict(p) for p in predictions]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,155 @@
+import copy
+import os
+import sys
+import threading
+import time
+
+
+def resource_path(relative_path):
+    """
+    Get absolute path to resource.
+    Works for both development (Python) and PyInstaller-built .exe
+    """
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+
+# -------------------------
+# Backend interface
+# -------------------------
+class DetectorBackend:
+    """
+    A UI-element detector. `predict` takes an image path (or BGR ndarray)
+    and returns predictions in Roboflow's format:
+    [{'class', 'x', 'y', 'width', 'height', 'confidence'}, ...]
+    with (x, y) the box centre in image pixels.
+    """
+
+    name = "base"
+
+    def load(self):
+        """Load weights / open sessions. Called once, before the first predict."""
+
+    def predict(self, image, confidence=0.50):
+        raise NotImplementedError
+
+
+# -------------------------
+# Hosted Roboflow model
+# -------------------------
+class RoboflowBackend(DetectorBackend):
+    name = "roboflow"
+
+    def __init__(self, api_key=None, workspace="ui-elements-t9wim", project="ui-elements-u0wsn", version="6"):
+        self.api_key = api_key or os.environ.get("ROBOFLOW_API_KEY", "apikeyXXXX")
+        self.workspace = workspace
+        self.project = project
+        self.version = version
+        self.model = None
+
+    def load(self):
+        from roboflow import Roboflow
+        rf = Roboflow(api_key=self.api_key)
+        project = rf.workspace(self.workspace).project(self.project)
+        self.model = project.version(self.version).model
+
+    def predict(self, image, confidence=0.50):
+        return self.model.predict(image, confidence=confidence).json()['predictions']
+
+
+# -------------------------
+# Local CPU model (YOLO .pt or ONNX export)
+# -------------------------
+class UltralyticsBackend(DetectorBackend):
+    """Runs YOLO weights or their ONNX export locally through ultralytics."""
+
+    name = "local"
+
+    def __init__(self, weights=None, device="cpu", imgsz=None):
+        self.weights = weights or os.environ.get("URA_DETECTOR_WEIGHTS", resource_path("ura_detector.onnx"))
+        self.device = device
+        self.imgsz = imgsz
+        self.model = None
+
+    def load(self):
+        from ultralytics import YOLO
+        self.model = YOLO(self.weights, task="detect")
+
+    def predict(self, image, confidence=0.50):
+        kwargs = {"conf": confidence, "device": self.device, "verbose": False}
+        if self.imgsz:
+            kwargs["imgsz"] = self.imgsz
+        result = self.model.predict(image, **kwargs)[0]
+
+        predictions = []
+        boxes = result.boxes
+        for (x, y, w, h), conf, cls in zip(boxes.xywh.tolist(), boxes.conf.tolist(), boxes.cls.tolist()):
+            predictions.append({
+                'class': result.names[int(cls)],
+                'x': x, 'y': y, 'width': w, 'height': h,
+                'confidence': conf,
+            })
+        return predictions
+
+
+# -------------------------
+# Deterministic stand-in for tests and benchmarks
+# -------------------------
+DEFAULT_FAKE_PREDICTIONS = [
+    {'class': 'tab_home_active', 'x': 60, 'y': 45, 'width': 50, 'height': 22, 'confidence': 0.93},
+    {'class': 'tab_insert_inactive', 'x': 120, 'y': 45, 'width': 50, 'height': 22, 'confidence': 0.91},
+    {'class': 'icon_bold', 'x': 300, 'y': 110, 'width': 24, 'height': 24, 'confidence': 0.88},
+    {'class': 'icon_italic', 'x': 326, 'y': 110, 'width': 24, 'height': 24, 'confidence': 0.86},
+    {'class': 'icon_underline', 'x': 352, 'y': 110, 'width': 24, 'height': 24, 'confidence': 0.84},
+    {'class': 'font_size_dropdown', 'x': 420, 'y': 84, 'width': 40, 'height': 22, 'confidence': 0.79},
+]
+
+
+class FakeBackend(DetectorBackend):
+    """Always returns the same predictions, optionally after `latency` seconds."""
+
+    name = "fake"
+
+    def __init__(self, predictions=None, latency=0.0):
+        self.predictions = predictions if predictions is not None else DEFAULT_FAKE_PREDICTIONS
+        self.latency = latency
+        self.calls = 0
+
+    def predict(self, image, confidence=0.50):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [copy.copy(p) for p in self.predictions if p['confidence'] >= confidence]
+
+
+# -------------------------
+# Selection by config
+# -------------------------
+BACKENDS = {
+    "roboflow": RoboflowBackend,
+    "local": UltralyticsBackend,
+    "fake": FakeBackend,
+}
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def get_backend(name=None):
+    """
+    Return the loaded backend called `name` (default: $URA_DETECTOR, else
+    "roboflow"). Each backend is created and loaded once, then reused.
+    """
+    name = name or os.environ.get("URA_DETECTOR", "roboflow")
+    with _loaded_lock:
+        backend = _loaded.get(name)
+        if backend is None:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown detector backend '{name}' (choose from {', '.join(BACKENDS)})")
+            backend = BACKENDS[name]()
+            backend.load()
+            _loaded[name] = backend
+    return backend
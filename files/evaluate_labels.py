@@ -0,0 +1,204 @@
+"""
+Offline accuracy and latency evaluation for label resolution.
+
+The corpus is a TSV of `phrase<TAB>expected_label` lines ('#' starts a
+comment). Any matcher with a `search(text, k)` method can be evaluated:
+the built-in ones by name, or your own as `module:factory`.
+
+    python evaluate_labels.py --matcher lexical --matcher difflib
+    python evaluate_labels.py --matcher hybrid --workers 4 --json eval.json
+"""
+import argparse
+import difflib
+import importlib
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from label_index import normalize_text
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(HERE, "..", "assets", "label_eval.tsv")
+DEFAULT_LABELS = os.path.join(HERE, "..", "assets", "label_mapping.txt")
+
+
+# -------------------------
+# Matchers
+# -------------------------
+class DifflibMatcher:
+    """The original SequenceMatcher scan, kept as a baseline."""
+
+    def __init__(self, hints, labels):
+        self.hints = hints
+        self.labels = labels
+
+    def search(self, user_text, k=5):
+        user_text = user_text.lower()
+        best = {}
+        for label in self.labels:
+            for kw in self.hints.get(label, []):
+                score = difflib.SequenceMatcher(None, user_text, kw.lower()).ratio()
+                if score > best.get(label, 0.0):
+                    best[label] = score
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        return [(label, round(score, 4)) for label, score in ranked[:k]]
+
+
+class _EngineMatcher:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def search(self, user_text, k=5):
+        return self.engine.match_labels(user_text, k=k)
+
+
+def _engine(matcher, label_path):
+    from llm_engine import SmartLLMEngine
+    from ollama_client import OllamaCLIClient
+    # Only the matcher is used; the client never gets called
+    return SmartLLMEngine(label_list_path=label_path, client=OllamaCLIClient(), matcher=matcher)
+
+
+def build_matcher(name, label_path):
+    if name in ("lexical", "semantic", "hybrid"):
+        return _EngineMatcher(_engine(name, label_path))
+    if name == "difflib":
+        engine = _engine("lexical", label_path)
+        return DifflibMatcher(engine.semantic_hints, engine.labels)
+    if ":" in name:
+        module_name, attr = name.split(":", 1)
+        return getattr(importlib.import_module(module_name), attr)(label_path)
+    raise ValueError(f"Unknown matcher '{name}'")
+
+
+# -------------------------
+# Corpus
+# -------------------------
+def load_corpus(path):
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            phrase, expected = line.split("\t")[:2]
+            items.append((phrase.strip(), expected.strip()))
+    return items
+
+
+def load_labels(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip().lstrip("- ").strip() for line in f if line.strip()]
+
+
+def hint_collisions(hints):
+    """Keywords listed under more than one label: {keyword: [labels]}."""
+    owners = defaultdict(set)
+    for label, keywords in hints.items():
+        for kw in keywords:
+            owners[normalize_text(kw)].add(label)
+    return {kw: sorted(labels) for kw, labels in sorted(owners.items()) if len(labels) > 1}
+
+
+# -------------------------
+# Evaluation
+# -------------------------
+_worker_matcher = None
+
+
+def _init_worker(name, label_path):
+    global _worker_matcher
+    _worker_matcher = build_matcher(name, label_path)
+
+
+def _run_chunk(chunk):
+    results = []
+    for phrase, expected in chunk:
+        start = time.perf_counter()
+        ranked = _worker_matcher.search(phrase, k=3)
+        elapsed = (time.perf_counter() - start) * 1000
+        results.append((phrase, expected, [label for label, _ in ranked], elapsed))
+    return results
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] if ordered else None
+
+
+def evaluate(name, corpus, label_path, workers=1, chunk_size=32):
+    chunks = [corpus[i:i + chunk_size] for i in range(0, len(corpus), chunk_size)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(name, label_path)) as pool:
+            results = [r for chunk in pool.map(_run_chunk, chunks) for r in chunk]
+    else:
+        _init_worker(name, label_path)
+        results = [r for chunk in chunks for r in _run_chunk(chunk)]
+
+    top1 = sum(1 for _, expected, ranked, _ in results if ranked[:1] == [expected])
+    top3 = sum(1 for _, expected, ranked, _ in results if expected in ranked)
+    confusions = Counter((expected, ranked[0] if ranked else None)
+                         for _, expected, ranked, _ in results if ranked[:1] != [expected])
+    misses = [{"phrase": phrase, "expected": expected, "got": ranked}
+              for phrase, expected, ranked, _ in results if ranked[:1] != [expected]]
+    latencies = sorted(r[3] for r in results)
+    n = len(results) or 1
+
+    return {
+        "matcher": name,
+        "items": len(results),
+        "top1_accuracy": round(top1 / n, 4),
+        "top3_accuracy": round(top3 / n, 4),
+        "confusions": [{"expected": e, "predicted": p, "count": c} for (e, p), c in confusions.most_common()],
+        "misses": misses,
+        "latency_ms": {
+            "mean": round(sum(latencies) / n, 4),
+            "p50": round(_percentile(latencies, 50), 4),
+            "p95": round(_percentile(latencies, 95), 4),
+            "p99": round(_percentile(latencies, 99), 4),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate label matchers on a labeled corpus")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--labels", default=DEFAULT_LABELS)
+    parser.add_argument("--matcher", action="append",
+                        help="lexical, semantic, hybrid, difflib or module:factory (repeatable)")
+    parser.add_argument("--workers", type=int, default=1, help="processes to spread the corpus over")
+    parser.add_argument("--json", help="write the full report as JSON to this path")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    known = set(load_labels(args.labels))
+    unknown = sorted({expected for _, expected in corpus if expected not in known})
+    if unknown:
+        print("⚠️ Corpus labels missing from label_mapping.txt:", ", ".join(unknown))
+
+    collisions = hint_collisions(_engine("lexical", args.labels).semantic_hints)
+    if collisions:
+        print(f"⚠️ {len(collisions)} hint keywords map to more than one label:")
+        for kw, labels in collisions.items():
+            print(f"   '{kw}': {', '.join(labels)}")
+
+    reports = []
+    for name in args.matcher or ["lexical"]:
+        report = evaluate(name, corpus, args.labels, workers=args.workers)
+        reports.append(report)
+        lat = report["latency_ms"]
+        print(f"\n{name}: top-1 {report['top1_accuracy']:.1%}  top-3 {report['top3_accuracy']:.1%}  "
+              f"latency p50 {lat['p50']:.3f} ms  p95 {lat['p95']:.3f} ms  p99 {lat['p99']:.3f} ms")
+        for c in report["confusions"][:10]:
+            print(f"   {c['expected']} -> {c['predicted']} (x{c['count']})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"corpus": args.corpus, "unknown_labels": unknown, "hint_collisions": collisions,
+                       "results": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
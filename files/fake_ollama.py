@@ -0,0 +1,270 @@
+"""
+Local stand-in for the Ollama generate API, for trying the LLM transports
+without Ollama or a GPU. Run directly to compare HTTP and subprocess latency:
+
+    python fake_ollama.py --latency 0.05 --runs 50
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from json_stream import JSONObjectScanner
+from ollama_client import OllamaCLIClient, OllamaHTTPClient
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json(200, {"version": "0.0.0-fake"})
+        elif self.path == "/api/ps":
+            self._send_json(200, {"models": [{"name": m, "model": m} for m in sorted(self.server.loaded)]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid json"})
+            return
+
+        server = self.server
+        if self.path == "/api/embed":
+            texts = request.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            self._send_json(200, {"model": request.get("model"), "embeddings": [server.embed(t) for t in texts]})
+            return
+
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        server.requests.append(request)
+        with server.lock:
+            failing = server.failures > 0
+            if failing:
+                server.failures -= 1
+        if failing:
+            self._send_json(500, {"error": "simulated failure"})
+            return
+
+        model = request.get("model")
+        if model not in server.loaded:
+            # Cold load; Ollama holds the request until the model is in memory
+            time.sleep(server.load_latency)
+            server.loaded.add(model)
+
+        if "prompt" not in request:
+            # Bare load request
+            self._send_json(200, {"model": request.get("model"), "response": "", "done": True})
+            return
+
+        time.sleep(server.latency)
+        text = server.response + server.filler
+        if not request.get("stream", True):
+            # Same generation time as streaming it, just delivered at once
+            time.sleep(server.token_latency * max(0, (len(text) + 3) // 4 - 1))
+            self._send_json(200, {
+                "model": request.get("model"),
+                "response": text,
+                "done": True,
+            })
+            return
+        self._stream(request, text)
+
+    def _stream(self, request, text, piece=4):
+        """NDJSON chunks of a few characters each, like tokens coming off the model."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = [text[i:i + piece] for i in range(0, len(text), piece)]
+        try:
+            for i, part in enumerate(pieces):
+                if i:
+                    time.sleep(self.server.token_latency)
+                self._send_chunk({"model": request.get("model"), "response": part, "done": False})
+            self._send_chunk({"model": request.get("model"), "response": "", "done": True})
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client had what it needed and hung up
+            self.server.stopped_early += 1
+            self.close_connection = True
+
+    def _send_chunk(self, payload):
+        line = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+
+class FakeOllamaServer:
+    """
+    Serves `/api/generate` on 127.0.0.1 from a background thread.
+    Every generation sleeps `latency` seconds and returns `response`
+    followed by `filler` (a model that keeps talking after its answer).
+    Streamed replies come a few characters at a time, `token_latency`
+    apart; `stopped_early` counts clients that hung up mid-stream.
+
+    The first request for a model pays `load_latency` (a cold load), until
+    unload() drops it again; /api/ps lists what is loaded. fail(n) makes the
+    next n generate requests answer HTTP 500.
+    """
+
+    def __init__(self, latency=0.0, response='{"tab": "Home"}', port=0, token_latency=0.0, filler="",
+                 load_latency=0.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.response = response
+        self.httpd.token_latency = token_latency
+        self.httpd.filler = filler
+        self.httpd.stopped_early = 0
+        self.httpd.load_latency = load_latency
+        self.httpd.loaded = set()
+        self.httpd.failures = 0
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = []
+        self.httpd.embed = self.embed
+        self._thread = None
+
+    @staticmethod
+    def embed(text, dim=16):
+        """Deterministic stand-in embedding: letter counts folded into `dim` slots."""
+        vector = [0.0] * dim
+        for ch in text.lower():
+            vector[ord(ch) % dim] += 1.0
+        return vector
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @property
+    def stopped_early(self):
+        return self.httpd.stopped_early
+
+    def unload(self, model=None):
+        """Forget a loaded model (all of them by default), like Ollama's keep-alive expiring."""
+        if model is None:
+            self.httpd.loaded.clear()
+        else:
+            self.httpd.loaded.discard(model)
+
+    def fail(self, count=1):
+        with self.httpd.lock:
+            self.httpd.failures += count
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+_FAKE_CLI = """
+import sys, time
+sys.stdin.read()
+time.sleep({latency!r})
+print({response!r})
+"""
+
+
+def make_fake_cli(latency=0.0, response='{"tab": "Home"}'):
+    """
+    Write a script that behaves like `ollama run <model>` and return the
+    command prefix to pass to OllamaCLIClient(command=...).
+    """
+    fd, path = tempfile.mkstemp(suffix="_fake_ollama.py")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(_FAKE_CLI.format(latency=latency, response=response))
+    return [sys.executable, path]
+
+
+def _first_object(client, model, prompt):
+    """Stream until the first complete JSON object, then hang up."""
+    scanner = JSONObjectScanner()
+    pieces = client.stream(model, prompt)
+    try:
+        for piece in pieces:
+            if scanner.feed(piece) is not None:
+                break
+    finally:
+        pieces.close()
+
+
+def _measure(client, runs, model="gemma:2b", prompt="make text bold", stream=False):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        if stream:
+            _first_object(client, model, prompt)
+        else:
+            client.generate(model, prompt)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.mean(samples), 2),
+        "p50_ms": round(samples[len(samples) // 2], 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Ollama transports against a fake server")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated model latency in seconds")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="delay between streamed pieces")
+    parser.add_argument("--filler", default="", help="text the model keeps generating after its JSON")
+    parser.add_argument("--runs", type=int, default=30)
+    args = parser.parse_args()
+
+    with FakeOllamaServer(latency=args.latency, token_latency=args.token_latency, filler=args.filler) as server:
+        http_client = OllamaHTTPClient(host=server.url)
+        print("http:", _measure(http_client, args.runs))
+        print("http stream (first object):", _measure(http_client, args.runs, stream=True))
+        http_client.close()
+
+    command = make_fake_cli(latency=args.latency)
+    try:
+        print("cli: ", _measure(OllamaCLIClient(command=command), args.runs))
+    finally:
+        os.remove(command[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import time
+
+import numpy as np
+
+
+class Frame:
+    """A captured window kept in memory: BGR pixels plus where they came from."""
+
+    def __init__(self, image, origin=(0, 0), hwnd=None, timestamp=None, window_size=None):
+        self.image = image
+        self.origin = origin
+        self.hwnd = hwnd
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self._window_size = window_size
+
+    @property
+    def size(self):
+        """(width, height) in pixels."""
+        return self.image.shape[1], self.image.shape[0]
+
+    @property
+    def window_size(self):
+        """(width, height) of the whole window; larger than `size` for a ribbon-only grab."""
+        return self._window_size or self.size
+
+    @property
+    def partial(self):
+        return self.window_size != self.size
+
+
+def scale_box(box, img_size, target_size):
+    """
+    Map an [x1, y1, x2, y2] box in image pixels onto a surface of
+    `target_size` (e.g. the overlay window). Returns (x, y, w, h) ints.
+    """
+    x1, y1, x2, y2 = box[:4]
+    width, height = img_size
+    target_w, target_h = target_size
+    x_scale = target_w / width
+    y_scale = target_h / height
+    return int(x1 * x_scale), int(y1 * y_scale), int((x2 - x1) * x_scale), int((y2 - y1) * y_scale)
+
+
+def synthetic_word_frame(width=1920, height=1040, ribbon_height=190, seed=0):
+    """
+    A Word-like BGR image for tests and benchmarks: a busy ribbon band
+    closed by a border line, a gray canvas and a white page.
+    """
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 200, np.uint8)
+    image[:ribbon_height] = 243
+    icons = rng.integers(40, 220, size=(ribbon_height - 40, width, 3), dtype=np.uint8)
+    image[30:ribbon_height - 10] = np.where(rng.random((ribbon_height - 40, width, 1)) < 0.3, icons, 243)
+    image[ribbon_height] = 120
+    page_x = width // 2 - min(width // 3, 420)
+    image[ribbon_height + 60:height - 20, page_x:width - page_x] = 255
+    return image
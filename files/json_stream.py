@@ -0,0 +1,58 @@
+import json
+
+
+class JSONObjectScanner:
+    """
+    Finds complete top-level JSON objects in text that arrives in pieces,
+    e.g. streamed model tokens. feed() returns the first object that parses
+    (None until one has closed); text outside objects, such as a model's
+    preamble, is skipped.
+
+        scanner = JSONObjectScanner()
+        for piece in stream:
+            obj = scanner.feed(piece)
+            if obj is not None:
+                break
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk):
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text):
+            c = text[self._pos]
+            if self._start is None:
+                if c == "{":
+                    self._start, self._depth = self._pos, 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c == "{":
+                self._depth += 1
+            elif c == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate, self._start = text[self._start:self._pos + 1], None
+                    self._pos += 1
+                    try:
+                        obj = json.loads(candidate)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(obj, dict):
+                        return obj
+                    continue
+            self._pos += 1
+        return None
@@ -0,0 +1,134 @@
+import re
+from collections import defaultdict
+
+
+# -------------------------
+# Tokenizing helpers
+# -------------------------
+_WORD_RE = re.compile(r"[a-z0-9%]+")
+
+# Words that carry no meaning for label matching ("how do i insert a table")
+STOP_WORDS = {
+    "a", "an", "the", "to", "how", "do", "i", "can", "my", "me", "in", "on",
+    "of", "for", "is", "it", "and", "or", "please", "want", "would", "like",
+    "some", "this", "that", "with", "where", "what", "you", "your",
+}
+
+
+def normalize_text(text):
+    """Lowercase text and collapse it to plain words separated by single spaces."""
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def char_ngrams(text, n=3):
+    """Character n-grams of a normalized string, padded so word edges count."""
+    padded = f" {text} "
+    if len(padded) < n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def content_words(text):
+    return [w for w in text.split() if w not in STOP_WORDS]
+
+
+# -------------------------
+# Inverted index
+# -------------------------
+class NgramLabelIndex:
+    """
+    Inverted index over the semantic hints of every label.
+
+    Each keyword is split into character trigrams and words once at build time.
+    A query only touches the posting lists of its own n-grams, so its cost
+    depends on the query length instead of on the size of the hint table.
+    """
+
+    def __init__(self, hints, labels=None, n=3, char_weight=0.6, max_df=0.05):
+        self.n = n
+        self.char_weight = char_weight
+        self.word_weight = 1.0 - char_weight
+
+        # keyword id -> (label, number of char grams, number of content words)
+        self._keywords = []
+        keyword_grams = []
+        self._char_postings = defaultdict(list)
+        self._word_postings = defaultdict(list)
+
+        allowed = set(labels) if labels is not None else None
+        for label, keywords in hints.items():
+            if allowed is not None and label not in allowed:
+                continue
+            for kw in keywords:
+                text = normalize_text(kw)
+                if not text:
+                    continue
+                kw_id = len(self._keywords)
+                grams = char_ngrams(text, n)
+                words = set(content_words(text)) or set(text.split())
+                self._keywords.append((label, len(grams), len(words)))
+                keyword_grams.append(grams)
+                for g in grams:
+                    self._char_postings[g].append(kw_id)
+                for w in words:
+                    self._word_postings[w].append(kw_id)
+
+        # Grams that appear in a large share of keywords ("ert", " in") say
+        # little about the label and would make posting scans grow with the
+        # table, so they are left out of scoring unless nothing else matches.
+        limit = max(8, int(len(self._keywords) * max_df))
+        self._stop_grams = {g for g, ids in self._char_postings.items() if len(ids) > limit}
+        self._keyword_stop_grams = [grams & self._stop_grams for grams in keyword_grams]
+
+    def __len__(self):
+        return len(self._keywords)
+
+    def search(self, user_text, k=5):
+        """
+        Return the `k` best labels for `user_text` as [(label, score), ...],
+        best first. Scores are in [0, 1].
+        """
+        text = normalize_text(user_text)
+        if not text:
+            return []
+
+        q_grams = char_ngrams(text, self.n)
+        q_words = set(content_words(text)) or set(text.split())
+
+        q_stop = q_grams & self._stop_grams
+        char_hits = defaultdict(int)
+        for g in q_grams - q_stop:
+            for kw_id in self._char_postings.get(g, ()):
+                char_hits[kw_id] += 1
+
+        word_hits = defaultdict(int)
+        for w in q_words:
+            for kw_id in self._word_postings.get(w, ()):
+                word_hits[kw_id] += 1
+
+        candidates = dict.fromkeys(char_hits)
+        stop_hits = not candidates
+        if stop_hits:
+            # Only common grams ("insert", "page"): score on those after all,
+            # over the keywords sharing a word or one of those grams
+            candidates.update(dict.fromkeys(word_hits))
+            for g in q_stop:
+                candidates.update(dict.fromkeys(self._char_postings[g]))
+
+        best = {}
+        q_len = len(q_grams)
+        for kw_id in candidates:
+            label, kw_grams, kw_words = self._keywords[kw_id]
+            hits = char_hits.get(kw_id, 0)
+            if stop_hits:
+                hits += len(q_stop & self._keyword_stop_grams[kw_id])
+            # Dice coefficient on character grams, like SequenceMatcher.ratio()
+            char_score = 2.0 * hits / (q_len + kw_grams)
+            # Share of the keyword's words the user actually typed
+            word_score = word_hits.get(kw_id, 0) / kw_words
+            score = self.char_weight * char_score + self.word_weight * word_score
+            if score > best.get(label, 0.0):
+                best[label] = score
+
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        return [(label, round(score, 4)) for label, score in ranked[:k]]
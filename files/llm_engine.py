@@ -1,9 +1,23 @@
-import subprocess
+import hashlib
 import json
-import difflib
 import re 
 import os
 import sys
+import time
+
+import tracing
+from label_index import NgramLabelIndex
+from llm_scheduler import INTERACTIVE, LLMScheduler
+from model_manager import ModelManager
+from json_stream import JSONObjectScanner
+from ollama_client import OllamaError, default_client
+from query_cache import QueryCache, make_key
+from tab_index import TabIndex
+
+OFFICE_TABS = ["Home", "Insert", "Design", "Layout", "References", "Review", "View", "Draw", "Mailings", "Help"]
+# The answer is a dozen tokens of JSON; cap generation in case the model rambles
+GEMMA_OPTIONS = {"num_predict": 32, "temperature": 0}
+
 def resource_path(relative_path):
     """
     Get absolute path to resource.
@@ -17,13 +31,38 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 class SmartLLMEngine:
-    def __init__(self, model_name="gemma:2b", label_list_path="label_mapping.txt"):
+    def __init__(self, model_name="gemma:2b", label_list_path="label_mapping.txt", client=None, timeout=25,
+                 cache=None, matcher="lexical", embedder=None, vector_cache_dir=None, hybrid_threshold=0.5,
+                 tab_index_path=None, direct_threshold=0.5, max_concurrent=1):
         self.model_name = model_name
-        label_list_path = resource_path(label_list_path)
+        # "lexical" (n-gram index), "semantic" (embedding matrix) or "hybrid"
+        # (semantic only when the lexical match is weak)
+        if matcher not in ("lexical", "semantic", "hybrid"):
+            raise ValueError(f"Unknown matcher '{matcher}'")
+        self.matcher = matcher
+        self.embedder = embedder
+        self.vector_cache_dir = vector_cache_dir
+        self.hybrid_threshold = hybrid_threshold
+        self.semantic_matcher = None
+        # HTTP to `ollama serve` with `ollama run` as fallback, unless a client is given
+        self.client = client or default_client(timeout=timeout)
+        # Shares identical in-flight queries and caps concurrent model calls
+        self.scheduler = LLMScheduler(max_concurrent=max_concurrent)
+        # Preload, keep-alive and health of the model; unhealthy means no Gemma calls
+        self.model = ModelManager(self.client, model_name, scheduler=self.scheduler)
+        # Results of earlier queries; memory-only unless a disk-backed cache is passed in
+        self.cache = cache if cache is not None else QueryCache()
+        self.label_list_path = resource_path(label_list_path)
 
         # Load labels from file
-        with open(label_list_path, "r", encoding="utf-8") as f:
-            self.labels = [line.strip().lstrip("- ").strip() for line in f if line.strip()]
+        self._load_labels()
+
+        # Label -> ribbon tab, shipped next to label_mapping.txt. A match scoring
+        # at least `direct_threshold` takes its tab from here instead of Gemma.
+        self.tab_index = TabIndex(tab_index_path or os.path.join(os.path.dirname(self.label_list_path),
+                                                                 "label_tabs.json"))
+        self.direct_threshold = direct_threshold
+        self.resolved = {"cache": 0, "index": 0, "gemma": 0, "fallback": 0}
 
         # Manual semantic hints (map label -> list of keywords/synonyms)
         self.semantic_hints = {
@@ -203,6 +242,9 @@ class SmartLLMEngine:
     "tab_view_inactive": ["view tab inactive"],
         }
 
+        # Inverted n-gram index over the hints, built once
+        self._rebuild_index()
+
 
     # Office-specific system prompt for Gemma
         self.system_prompt = (
@@ -218,24 +260,126 @@ class SmartLLMEngine:
 
         )
 
-    def query(self, user_text: str) -> dict:
-        """Main query to identify which tab the user's request belongs to."""
-        label = self._match_label(user_text)
-        tab_data = self._generate_tab_with_gemma(user_text)
-        return {"intent": user_text, "label": label, "tabs": tab_data}
+    def _load_labels(self):
+        with open(self.label_list_path, "rb") as f:
+            data = f.read()
+        self.labels = [line.strip().lstrip("- ").strip() for line in data.decode("utf-8").splitlines() if line.strip()]
+        self._labels_hash = hashlib.sha1(data).hexdigest()
+        st = os.stat(self.label_list_path)
+        self._labels_stat = (st.st_mtime_ns, st.st_size)
+
+    def _rebuild_index(self):
+        self.label_index = NgramLabelIndex(self.semantic_hints, self.labels)
+        matcher_id = self.matcher
+        if self.matcher != "lexical":
+            from semantic_matcher import HashedNgramEmbedder, SemanticLabelMatcher  # numpy, only when asked for
+            try:
+                self.semantic_matcher = SemanticLabelMatcher(self.semantic_hints, self.labels, embedder=self.embedder,
+                                                             cache_dir=self.vector_cache_dir)
+            except OllamaError as e:
+                # Embedding model unreachable: the offline embedder still works
+                print("⚠️ Embedding model unavailable, using the built-in embedder:", e)
+                self.embedder = HashedNgramEmbedder()
+                self.semantic_matcher = SemanticLabelMatcher(self.semantic_hints, self.labels, embedder=self.embedder,
+                                                             cache_dir=self.vector_cache_dir)
+            matcher_id += ":" + self.semantic_matcher.embedder.id
+        hints = json.dumps(self.semantic_hints, sort_keys=True).encode("utf-8")
+        tabs = f"{self.tab_index.hash}:{self.direct_threshold}"
+        self.fingerprint = hashlib.sha1(
+            self._labels_hash.encode("ascii") + hints + matcher_id.encode("utf-8") + tabs.encode("ascii")).hexdigest()
+        self.cache.set_fingerprint(self.fingerprint)
+
+    def _refresh_labels_if_changed(self):
+        try:
+            st = os.stat(self.label_list_path)
+        except OSError:
+            return
+        if (st.st_mtime_ns, st.st_size) != self._labels_stat:
+            self._load_labels()
+            self._rebuild_index()
+
+    def set_semantic_hints(self, hints: dict):
+        """Replace the keyword hints; rebuilds the index and invalidates cached answers."""
+        self.semantic_hints = hints
+        self._rebuild_index()
+
+    def query(self, user_text: str, priority=INTERACTIVE) -> dict:
+        """
+        Resolve the request to a label and its ribbon tab, cheapest tier first:
+        cached answer, confident match with the tab from the index, then Gemma.
+        "tab_label" is the tab header to highlight when the button isn't visible.
+        A query identical to one still running waits for that one's answer.
+        """
+        self._refresh_labels_if_changed()
+        key = make_key(user_text, self.model_name, self.fingerprint)
+        with tracing.span("engine.cache"):
+            cached = self.cache.get(key)
+        if cached is not None:
+            self.resolved["cache"] += 1
+            candidates = [tuple(c) for c in cached["candidates"]]
+            return {**cached, "intent": user_text, "candidates": candidates}
+
+        result = self.scheduler.coalesce(key, lambda: self._resolve(user_text, key, priority))
+        return {**result, "intent": user_text}
+
+    def _resolve(self, user_text, key, priority):
+        with tracing.span("engine.match"):
+            candidates = self.match_labels(user_text)
+        label = candidates[0][0] if candidates else None
+
+        tab_data = self.tab_index.tab_for(label) if candidates and candidates[0][1] >= self.direct_threshold else None
+        source = "index"
+        if not tab_data and not self.model.usable():
+            # Model loading or down: answer from the lexical match rather than wait
+            source = "fallback"
+            tab_data = self.tab_index.tab_for(label)
+        elif not tab_data:
+            source = "gemma"
+            with tracing.span("engine.gemma", model=self.model_name), self.scheduler.slot(priority):
+                tab_data = self._generate_tab_with_gemma(user_text)
+            if not tab_data:
+                # Gemma failed or gave nothing usable: answer from the index, uncached
+                source = "fallback"
+                tab_data = self.tab_index.tab_for(label)
+        self.resolved[source] += 1
+        result = {"intent": user_text, "label": label, "candidates": candidates, "tabs": tab_data,
+                  "tab_label": self.tab_index.tab_label(tab_data), "source": source}
+        # Gemma may do better than the fallback once it is back; don't pin the fallback
+        if tab_data and source != "fallback":
+            self.cache.put(key, result)
+        return result
+
+    def warm(self):
+        """Load the model; queued behind any interactive query. False if it failed to load."""
+        return self.model.preload()
+
+    def match_labels(self, user_text: str, k: int = 5):
+        """Ranked top-k labels for the request as [(label, score), ...]."""
+        if self.matcher == "semantic":
+            try:
+                return self.semantic_matcher.search(user_text, k=k)
+            except OllamaError as e:
+                print("⚠️ Embedding failed, using the keyword index:", e)
+                return self.label_index.search(user_text, k=k)
+
+        lexical = self.label_index.search(user_text, k=k)
+        if self.matcher == "lexical" or (lexical and lexical[0][1] >= self.hybrid_threshold):
+            return lexical
+
+        # Weak keyword match: let the embedding scores compete
+        scores = dict(lexical)
+        try:
+            semantic = self.semantic_matcher.search(user_text, k=k)
+        except OllamaError as e:
+            print("⚠️ Embedding failed, using the keyword index:", e)
+            semantic = []
+        for label, score in semantic:
+            scores[label] = max(score, scores.get(label, 0.0))
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
 
     def _match_label(self, user_text: str):
-        user_text = user_text.lower()
-        best_label = None
-        best_score = 0
-        for label in self.labels:
-            keywords = self.semantic_hints.get(label, [])
-            for kw in keywords:
-                score = difflib.SequenceMatcher(None, user_text, kw.lower()).ratio()
-                if score > best_score:
-                    best_score = score
-                    best_label = label
-        return best_label
+        candidates = self.match_labels(user_text, k=1)
+        return candidates[0][0] if candidates else None
     
     def _generate_tab_with_gemma(self, user_text: str):
         """
@@ -249,17 +393,22 @@ class SmartLLMEngine:
             f"Return ONLY valid JSON in this exact format: {{\"tab\": \"Home\"}}"
         )
 
+        start = time.perf_counter()
         try:
-            proc = subprocess.run(
-                ["ollama", "run", self.model_name],
-                input=prompt.encode("utf-8"),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=25
-            )
+            if hasattr(self.client, "stream"):
+                tab, output = self._stream_tab_json(prompt)
+            else:
+                tab, output = None, self.client.generate(self.model_name, prompt)
+        except OllamaError as e:
+            print("❌ Gemma query failed:", e)
+            self.model.record_failure(e)
+            return ""
+        self.model.record_success((time.perf_counter() - start) * 1000)
+        if tab is not None:
+            return tab
 
-            output = proc.stdout.decode("utf-8", errors="ignore").strip()
-            output = re.sub(r"(?i)thinking.*?(?=\n|$)", "", output)
+        try:
+            output = re.sub(r"(?i)thinking.*?(?=\n|$)", "", output.strip())
 
             match = re.search(r"\{.*\}", output, re.DOTALL)
             if match:
@@ -270,16 +419,34 @@ class SmartLLMEngine:
                     pass
 
             # Fallback: extract tab keyword from text
-            for tab in [
-                "Home", "Insert", "Design", "Layout", "References",
-                "Review", "View", "Draw", "Mailings", "Help"
-            ]:
+            for tab in OFFICE_TABS:
                 if tab.lower() in output.lower():
                     return tab
 
             return ""
 
-        except subprocess.TimeoutExpired:
+        except Exception as e:
+            print("❌ Could not read Gemma's answer:", e)
             return ""
-        except Exception:
-            return ""
\ No newline at end of file
+
+    def _stream_tab_json(self, prompt):
+        """
+        Stream Gemma's answer and stop reading at the first complete JSON
+        object with a "tab", which also ends the generation server-side.
+        Returns (tab or None, text received so far).
+        """
+        schema = {
+            "type": "object",
+            "properties": {"tab": {"type": "string", "enum": list(self.tab_index.tabs) or OFFICE_TABS}},
+            "required": ["tab"],
+        }
+        scanner = JSONObjectScanner()
+        pieces = self.client.stream(self.model_name, prompt, options=GEMMA_OPTIONS, format=schema)
+        try:
+            for piece in pieces:
+                obj = scanner.feed(piece)
+                if obj is not None and isinstance(obj.get("tab"), str):
+                    return obj["tab"].strip(), scanner.text
+        finally:
+            pieces.close()
+        return None, scanner.text
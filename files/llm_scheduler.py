@@ -0,0 +1,105 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+import tracing
+
+
+# Lower runs first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class _Call:
+    """One in-flight computation that identical requests wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LLMScheduler:
+    """
+    Sits between SmartLLMEngine and the model.
+
+    coalesce(key, fn) runs fn once for identical concurrent requests (a
+    double Enter, two clients asking the same thing) and hands every caller
+    the same result. slot(priority) admits at most `max_concurrent` model
+    calls at a time; waiting callers go interactive before background and,
+    within a priority, newest first, since the user has moved on from the
+    older questions.
+    """
+
+    def __init__(self, max_concurrent=1):
+        self.max_concurrent = max(1, max_concurrent)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = []              # heap of (priority, -seq)
+        self._seq = itertools.count()
+        self._calls = {}
+        self._calls_lock = threading.Lock()
+        self._wait = tracing.Histogram()
+        self.stats = {"admitted": 0, "coalesced": 0, "max_depth": 0}
+
+    def coalesce(self, key, fn):
+        with self._calls_lock:
+            call = self._calls.get(key)
+            owner = call is None
+            if owner:
+                call = self._calls[key] = _Call()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._calls_lock:
+                del self._calls[key]
+            call.done.set()
+
+    @contextmanager
+    def slot(self, priority=INTERACTIVE):
+        """Hold one of the model slots for the duration of the block; yields the wait in ms."""
+        start = time.perf_counter()
+        with self._cond:
+            entry = (priority, -next(self._seq))
+            heapq.heappush(self._waiting, entry)
+            self.stats["max_depth"] = max(self.stats["max_depth"], len(self._waiting))
+            while self._active >= self.max_concurrent or self._waiting[0] is not entry:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._active += 1
+            self.stats["admitted"] += 1
+            # The next in line may fit into a slot that is still free
+            self._cond.notify_all()
+
+        waited = (time.perf_counter() - start) * 1000
+        self._wait.observe(waited)
+        if tracing.enabled():
+            tracing.histogram("llm.queue_wait").observe(waited)
+        try:
+            yield waited
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+    def metrics(self):
+        """Current queue depth and model calls in flight, counters and queue wait times."""
+        with self._cond:
+            depth, active = len(self._waiting), self._active
+        return {"queue_depth": depth, "in_flight": active, "max_concurrent": self.max_concurrent,
+                **self.stats, "wait": self._wait.snapshot()}
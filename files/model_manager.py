@@ -0,0 +1,155 @@
+import threading
+import time
+
+import tracing
+from llm_scheduler import BACKGROUND
+from ollama_client import OllamaError
+
+
+# Health states
+COLD = "cold"                # not loaded yet
+LOADING = "loading"          # preload or reload in progress
+READY = "ready"
+DEGRADED = "degraded"        # answering, but slowly or after a recent failure
+UNAVAILABLE = "unavailable"  # failed repeatedly; queries use the lexical matcher
+
+
+class ModelManager:
+    """
+    Keeps the Gemma model loaded and tracks whether it can be relied on.
+
+    preload() loads it, start_keep_alive() re-checks every
+    `keep_alive_interval` seconds and reloads it when Ollama has unloaded
+    it. SmartLLMEngine reports every call through record_success() and
+    record_failure(), and asks usable() before calling the model at all.
+    An unavailable model is tried again once `retry_after` seconds have
+    passed, by a single caller; everyone else keeps taking the fallback
+    until that attempt reports back. Listeners get (state, detail) on every
+    state change, from whichever thread caused it.
+    """
+
+    def __init__(self, client, model, scheduler=None, keep_alive_interval=240.0, slow_ms=5000.0,
+                 failure_limit=2, retry_after=30.0):
+        self.client = client
+        self.model = model
+        self.scheduler = scheduler
+        self.keep_alive_interval = keep_alive_interval
+        self.slow_ms = slow_ms
+        self.failure_limit = failure_limit
+        self.retry_after = retry_after
+        self.state = COLD
+        self.detail = ""
+        self.load_ms = None
+        self.failures = 0
+        self.latency = tracing.Histogram()
+        self._failed_at = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def _set_state(self, state, detail="", **fields):
+        """Switch state, updating `fields` (failures, _failed_at, ...) in the same locked step."""
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            changed = (state, detail) != (self.state, self.detail)
+            self.state, self.detail = state, detail
+        if changed:
+            for callback in list(self._listeners):
+                callback(state, detail)
+
+    def usable(self):
+        """False while loading or unavailable; when a retry is due, True for one caller only."""
+        with self._lock:
+            if self.state == LOADING:
+                return False
+            if self.state == UNAVAILABLE:
+                now = time.monotonic()
+                if self._failed_at is None or now - self._failed_at < self.retry_after:
+                    return False
+                # Claim the retry: the next caller waits another retry_after
+                self._failed_at = now
+            return True
+
+    def record_success(self, ms):
+        self.latency.observe(ms)
+        if ms > self.slow_ms:
+            self._set_state(DEGRADED, f"slow answers ({ms / 1000:.1f}s)", failures=0)
+        else:
+            self._set_state(READY, failures=0)
+
+    def record_failure(self, error):
+        with self._lock:
+            failures = self.failures = self.failures + 1
+        state = UNAVAILABLE if failures >= self.failure_limit else DEGRADED
+        self._set_state(state, str(error), _failed_at=time.monotonic())
+
+    def disable(self, reason="disabled"):
+        """Never call the model again; every query takes the fallback."""
+        self._set_state(UNAVAILABLE, reason, retry_after=float("inf"), failures=self.failure_limit,
+                        _failed_at=time.monotonic())
+
+    def preload(self):
+        """Load the model into memory; returns False (and goes unavailable) on failure."""
+        self._set_state(LOADING, "loading" if self.state == COLD else "reloading")
+        start = time.perf_counter()
+        try:
+            self._background(self.client.warm, self.model)
+        except OllamaError as e:
+            self._set_state(UNAVAILABLE, str(e), failures=self.failure_limit, _failed_at=time.monotonic())
+            return False
+        self._set_state(READY, load_ms=(time.perf_counter() - start) * 1000, failures=0)
+        return True
+
+    def check(self):
+        """One keep-alive round: reload if unloaded or due for a retry, else refresh the keep-alive."""
+        if self.state == UNAVAILABLE:
+            if self.usable():
+                self.preload()
+            return
+        try:
+            resident = self._background(self.client.loaded, self.model)
+        except OllamaError as e:
+            self.record_failure(e)
+            return
+        if resident is False:
+            self.preload()
+            return
+        try:
+            # Any request with keep_alive restarts Ollama's unload timer
+            self._background(self.client.warm, self.model)
+        except OllamaError as e:
+            self.record_failure(e)
+
+    def _background(self, fn, *args):
+        if self.scheduler is None:
+            return fn(*args)
+        with self.scheduler.slot(BACKGROUND):
+            return fn(*args)
+
+    def start_keep_alive(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="model-keep-alive", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.keep_alive_interval):
+            try:
+                self.check()
+            except Exception as e:
+                print("❌ Model keep-alive failed:", e)
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        with self._lock:
+            status = {"state": self.state, "detail": self.detail, "load_ms": self.load_ms,
+                      "failures": self.failures}
+        status["latency"] = self.latency.snapshot()
+        return status
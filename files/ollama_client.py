@@ -0,0 +1,380 @@
+import codecs
+import http.client
+import json
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import threading
+from urllib.parse import urlsplit
+
+
+DEFAULT_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+DEFAULT_TIMEOUT = float(os.environ.get("URA_OLLAMA_TIMEOUT", "25"))
+
+
+class OllamaError(Exception):
+    """Raised when a transport cannot produce a generation."""
+
+
+class OllamaUnavailable(OllamaError):
+    """The transport is not there at all (nothing listening, no binary); another one may be."""
+
+
+# -------------------------
+# HTTP transport (long-lived server)
+# -------------------------
+class OllamaHTTPClient:
+    """
+    Talks to a running `ollama serve` over HTTP/1.1 keep-alive connections.
+    Connections are pooled and reused between queries, and every request asks
+    the server to keep the model loaded for `keep_alive`.
+    """
+
+    name = "http"
+
+    def __init__(self, host=DEFAULT_HOST, timeout=DEFAULT_TIMEOUT, keep_alive="30m", pool_size=2):
+        if "://" not in host:
+            host = "http://" + host
+        parts = urlsplit(host)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 11434
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _transport_error(self, e):
+        # A timeout means the server is there but busy (e.g. loading the model);
+        # trying another transport would only wait all over again
+        if isinstance(e, (socket.timeout, TimeoutError)):
+            return OllamaError(f"Ollama did not answer within {self.timeout}s")
+        return OllamaUnavailable(f"Ollama server unreachable: {e}")
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _post(self, path, payload):
+        return self._request("POST", path, payload)
+
+    def _request(self, method, path, payload=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+
+        # A pooled connection may have been dropped by the server while idle;
+        # retry once on a fresh one before giving up.
+        for attempt in range(2):
+            conn = self._acquire()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if attempt == 0:
+                    continue
+                raise OllamaUnavailable(f"Ollama server at {self.host}:{self.port} closed the connection")
+            except OSError as e:
+                conn.close()
+                raise self._transport_error(e) from e
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+
+            if resp.status != 200:
+                raise OllamaError(f"Ollama returned HTTP {resp.status}: {data[:200]!r}")
+            try:
+                return json.loads(data)
+            except json.JSONDecodeError as e:
+                raise OllamaError("Ollama returned invalid JSON") from e
+
+    def generate(self, model, prompt, options=None):
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+        }
+        if options:
+            payload["options"] = options
+        return self._post("/api/generate", payload).get("response", "")
+
+    def stream(self, model, prompt, options=None, format=None):
+        """
+        Yield the generated text piece by piece. Closing the generator early
+        (break) drops the connection, which makes Ollama stop generating.
+        `format` is "json" or a JSON schema; a server too old for schemas
+        gets plain "json" instead.
+        """
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+        }
+        if options:
+            payload["options"] = options
+        if format:
+            payload["format"] = format
+
+        conn, resp = self._open_stream(payload)
+        if resp.status == 400 and isinstance(format, dict):
+            # Server predates structured outputs; plain JSON mode instead
+            resp.read()
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            conn, resp = self._open_stream({**payload, "format": "json"})
+        if resp.status != 200:
+            data = resp.read()
+            conn.close()
+            raise OllamaError(f"Ollama returned HTTP {resp.status}: {data[:200]!r}")
+
+        finished = False
+        try:
+            for line in iter(resp.readline, b""):
+                if not line.strip():
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise OllamaError("Ollama returned invalid JSON") from e
+                if "error" in chunk:
+                    raise OllamaError(f"Ollama error: {chunk['error']}")
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    finished = True
+                    break
+        except OSError as e:
+            raise OllamaError(f"Ollama stream broke off: {e}") from e
+        finally:
+            if finished and not resp.will_close:
+                resp.read()
+                self._release(conn)
+            else:
+                conn.close()
+
+    def _open_stream(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        for attempt in range(2):
+            conn = self._acquire()
+            try:
+                conn.request("POST", "/api/generate", body=body, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if attempt == 0:
+                    continue
+                raise OllamaUnavailable(f"Ollama server at {self.host}:{self.port} closed the connection")
+            except OSError as e:
+                conn.close()
+                raise self._transport_error(e) from e
+
+    def embed(self, model, texts):
+        """Embedding vectors for `texts` from an embedding model."""
+        payload = {"model": model, "input": list(texts), "keep_alive": self.keep_alive}
+        return self._post("/api/embed", payload).get("embeddings", [])
+
+    def warm(self, model):
+        """Load the model into memory without generating anything."""
+        self._post("/api/generate", {"model": model, "keep_alive": self.keep_alive})
+
+    def loaded(self, model):
+        """Whether `model` is currently in memory (/api/ps)."""
+        models = self._request("GET", "/api/ps").get("models", [])
+        return any(model in (m.get("name"), m.get("model")) for m in models)
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# -------------------------
+# Subprocess transport (`ollama run`)
+# -------------------------
+class OllamaCLIClient:
+    """Spawns `ollama run <model>` per query. Slow, but needs no server."""
+
+    name = "cli"
+
+    def __init__(self, command=("ollama", "run"), timeout=DEFAULT_TIMEOUT):
+        self.command = list(command)
+        self.timeout = timeout
+
+    def generate(self, model, prompt, options=None):
+        try:
+            proc = subprocess.run(
+                self.command + [model],
+                input=prompt.encode("utf-8"),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=self.timeout
+            )
+        except subprocess.TimeoutExpired as e:
+            raise OllamaError(f"`{' '.join(self.command)}` timed out after {self.timeout}s") from e
+        except OSError as e:
+            raise OllamaUnavailable(f"Could not start `{' '.join(self.command)}`: {e}") from e
+        if proc.returncode != 0:
+            error = proc.stderr.decode("utf-8", errors="ignore").strip()
+            raise OllamaUnavailable(f"`{' '.join(self.command)}` exited with {proc.returncode}: {error}")
+        return proc.stdout.decode("utf-8", errors="ignore").strip()
+
+    def stream(self, model, prompt, options=None, format=None):
+        """
+        Yield stdout of `ollama run` as it is produced; closing the generator
+        kills the process. Only a "json" format is passed on (--format json);
+        `ollama run` takes no sampling options.
+        """
+        args = self.command + (["--format", "json"] if format else []) + [model]
+        try:
+            proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            raise OllamaUnavailable(f"Could not start `{' '.join(self.command)}`: {e}") from e
+
+        watchdog = threading.Timer(self.timeout, proc.kill)
+        watchdog.daemon = True
+        watchdog.start()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        try:
+            proc.stdin.write(prompt.encode("utf-8"))
+            proc.stdin.close()
+            while True:
+                data = proc.stdout.read1(256)
+                if not data:
+                    break
+                text = decoder.decode(data)
+                if text:
+                    yield text
+            returncode = proc.wait()
+            if returncode != 0:
+                if not watchdog.is_alive():
+                    # Killed by the watchdog
+                    raise OllamaError(f"`{' '.join(self.command)}` timed out after {self.timeout}s")
+                raise OllamaUnavailable(f"`{' '.join(self.command)}` exited with {returncode}")
+        except OSError as e:
+            raise OllamaError(f"`{' '.join(self.command)}` failed: {e}") from e
+        finally:
+            watchdog.cancel()
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+    def embed(self, model, texts):
+        raise OllamaError("`ollama run` cannot produce embeddings")
+
+    def warm(self, model):
+        # Nothing to preload, but at least make sure there is something to run
+        if shutil.which(self.command[0]) is None:
+            raise OllamaUnavailable(f"`{self.command[0]}` not found")
+
+    def loaded(self, model):
+        return None  # unknown; `ollama run` loads the model per call anyway
+
+    def close(self):
+        pass
+
+
+# -------------------------
+# HTTP first, CLI as fallback
+# -------------------------
+class FallbackClient:
+    """
+    Uses the first transport that is there; later ones are only tried when
+    one is unavailable. Timeouts and errors from a server that did answer
+    are raised as they are.
+    """
+
+    def __init__(self, *transports):
+        self.transports = list(transports)
+        self.last_transport = None
+
+    @property
+    def name(self):
+        return "+".join(t.name for t in self.transports)
+
+    def generate(self, model, prompt, options=None):
+        errors = []
+        for transport in self.transports:
+            try:
+                output = transport.generate(model, prompt, options=options)
+                self.last_transport = transport.name
+                return output
+            except OllamaUnavailable as e:
+                errors.append(f"{transport.name}: {e}")
+        raise OllamaUnavailable("; ".join(errors))
+
+    def stream(self, model, prompt, options=None, format=None):
+        """Stream from the first transport that starts producing output."""
+        errors = []
+        for transport in self.transports:
+            pieces = transport.stream(model, prompt, options=options, format=format)
+            try:
+                first = next(pieces, None)
+            except OllamaUnavailable as e:
+                errors.append(f"{transport.name}: {e}")
+                continue
+            self.last_transport = transport.name
+            try:
+                if first is not None:
+                    yield first
+                yield from pieces
+            finally:
+                pieces.close()
+            return
+        raise OllamaUnavailable("; ".join(errors))
+
+    def embed(self, model, texts):
+        errors = []
+        for transport in self.transports:
+            try:
+                return transport.embed(model, texts)
+            except OllamaUnavailable as e:
+                errors.append(f"{transport.name}: {e}")
+        raise OllamaUnavailable("; ".join(errors))
+
+    def warm(self, model):
+        errors = []
+        for transport in self.transports:
+            try:
+                transport.warm(model)
+                self.last_transport = transport.name
+                return
+            except OllamaUnavailable as e:
+                errors.append(f"{transport.name}: {e}")
+        raise OllamaUnavailable("; ".join(errors))
+
+    def loaded(self, model):
+        for transport in self.transports:
+            try:
+                return transport.loaded(model)
+            except OllamaUnavailable:
+                continue
+        return None
+
+    def close(self):
+        for transport in self.transports:
+            transport.close()
+
+
+def default_client(timeout=DEFAULT_TIMEOUT, host=DEFAULT_HOST):
+    return FallbackClient(
+        OllamaHTTPClient(host=host, timeout=timeout),
+        OllamaCLIClient(timeout=timeout),
+    )
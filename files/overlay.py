@@ -1,44 +1,179 @@
-import win32gui
+import os
+import time
+
 from PyQt5.QtWidgets import QWidget
-from PyQt5.QtCore import Qt, QRect, QTimer
-from PyQt5.QtGui import QPainter, QColor, QPen, QFont
+from PyQt5.QtCore import Qt, QRect, QPoint, QTimer, QObject, QVariantAnimation, QEasingCurve, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor, QPen, QFont, QBrush, QPolygon, QRegion, QStaticText
+
+import tracing
+import window_provider
+from frame import scale_box
+from screen_capture import exclude_from_capture, grab_region
+
+# Room around a box for its label, pulse growth and arrow
+_MARGIN = 48
+_ARROW_LEN = 40
 
 class Overlay(QWidget):
-    def __init__(self, target_hwnd=None):
+    """
+    One persistent, click-through highlight window over the target app.
+
+    Paint resources (pens, fonts, label text layouts, geometry) are built
+    once per set_boxes/move_boxes, so a repaint only draws. Fades and the
+    pulse run on QVariantAnimations that repaint just the box regions.
+    Styles: "box", "pulse", "arrow" and "steps" (numbered boxes).
+    """
+    STYLES = ("box", "pulse", "arrow", "steps")
+    target_event = pyqtSignal(str)
+
+    def __init__(self, target_hwnd=None, style=None, windows=None):
         super().__init__()
         self.target_hwnd = target_hwnd
-        self.boxes = []  # [[x1,y1,x2,y2,label,alpha], ...]
+        self.windows = windows or window_provider.get_window_provider()
+        self.style = style or os.environ.get("URA_HIGHLIGHT_STYLE", "box")
+        self.boxes = []  # [[x1,y1,x2,y2,label], ...] in image pixels
         self.img_size = (1, 1)
+        self.opacity = 1.0
+        self.pulse = 0.0
+        self.last_paint_ms = 0.0
 
         # Transparent, topmost, frameless window
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.setAttribute(Qt.WA_TransparentForMouseEvents, True)
 
-        # Timer for fading
-        self.timer = QTimer()
-        self.timer.setInterval(50)  # 50 ms per step
-        self.timer.timeout.connect(self.fade_boxes)
+        # Cached paint resources
+        self._box_pen = QPen(QColor(255, 0, 0), 3)
+        self._text_pen = QPen(QColor(255, 255, 255))
+        self._font = QFont()
+        self._font.setPointSize(10)
+        self._step_font = QFont()
+        self._step_font.setPointSize(10)
+        self._step_font.setBold(True)
+        self._red_brush = QBrush(QColor(255, 0, 0))
+        self._no_pen = QPen(Qt.NoPen)
+        self._rects = []        # (x, y, w, h) per box in widget pixels
+        self._labels = []       # QStaticText per box
+        self._steps = []        # QStaticText "1", "2", ...
+        self._arrows = []       # QPolygon per box
+        self._dirty = QRegion()
+
+        # Fade out after a delay
+        self.fade_delay = QTimer(self)
+        self.fade_delay.setSingleShot(True)
+        self.fade = QVariantAnimation(self)
+        self.fade.setStartValue(1.0)
+        self.fade.setEndValue(0.0)
+        self.fade.setDuration(800)
+        self.fade.valueChanged.connect(self._set_opacity)
+        self.fade.finished.connect(self.hide_overlay)
+        self.fade_delay.timeout.connect(self.fade.start)
+
+        # Pulse animation, only running for the "pulse" style
+        self.pulser = QVariantAnimation(self)
+        self.pulser.setStartValue(0.0)
+        self.pulser.setKeyValueAt(0.5, 1.0)
+        self.pulser.setEndValue(0.0)
+        self.pulser.setDuration(900)
+        self.pulser.setEasingCurve(QEasingCurve.InOutSine)
+        self.pulser.setLoopCount(-1)
+        self.pulser.valueChanged.connect(self._set_pulse)
+
+        # Follow the target window; provider events arrive on its own thread
+        self.target_event.connect(self._on_target_event)
+        self.windows.subscribe(self._window_event)
+
+        # Our own highlight must not show up in captures (tracking matches on them)
+        exclude_from_capture(self)
 
         self.hide()
 
-    def set_boxes(self, boxes, img_size):
-        """Set detected boxes and start auto-fade after 2 seconds"""
-        self.boxes = [[*b, 255] for b in boxes]  # add alpha channel
+    def set_target(self, hwnd):
+        self.target_hwnd = hwnd
+
+    def set_boxes(self, boxes, img_size=None, frame=None, fade_after=2000, style=None):
+        """Set detected boxes and start auto-fade after `fade_after` ms.
+        Box coordinates are in pixels of `frame` (or of an image of `img_size`)."""
+        if frame is not None:
+            img_size = frame.window_size
+        if style:
+            self.style = style
+        self.fade.stop()
+        self.boxes = [list(b[:5]) for b in boxes]
         self.img_size = img_size
-        self.update()
+        self.opacity = 1.0
+        self._labels = [QStaticText(str(b[4])) for b in self.boxes]
+        self._steps = [QStaticText(str(i + 1)) for i in range(len(self.boxes))]
+        self._relayout()
 
-        # Auto-start fade after 2 seconds
-        QTimer.singleShot(2000, self.timer.start)
+        if self.style == "pulse":
+            self.pulser.start()
+        else:
+            self.pulser.stop()
+            self.pulse = 0.0
+        self.fade_delay.start(fade_after)
+
+    def move_boxes(self, boxes, img_size):
+        """Move the current boxes (same order) to new coordinates, keeping label and fade."""
+        for b, new in zip(self.boxes, boxes):
+            b[:4] = new[:4]
+        self.img_size = img_size
+        self.reposition_to_target()
+        self._relayout()
+
+    def _relayout(self):
+        """Recompute widget-space geometry; repaints the old and new box areas."""
+        old_dirty = self._dirty
+        win_size = (self.width(), self.height())
+        self._rects = [scale_box(b, self.img_size, win_size) for b in self.boxes]
+
+        self._arrows = []
+        dirty = QRegion()
+        for x, y, w, h in self._rects:
+            # Arrow pointing at the box's bottom-left corner from below-left
+            tip = QPoint(x, y + h)
+            self._arrows.append(QPolygon([
+                tip, QPoint(x - 6, y + h + 18), QPoint(x - 2, y + h + 16),
+                QPoint(x - _ARROW_LEN + 12, y + h + _ARROW_LEN),
+                QPoint(x - _ARROW_LEN + 16, y + h + _ARROW_LEN + 4),
+                QPoint(x + 2, y + h + 20), QPoint(x + 4, y + h + 24),
+            ]))
+            dirty = dirty.united(QRect(x - _MARGIN, y - _MARGIN, w + 2 * _MARGIN, h + 2 * _MARGIN))
+        self._dirty = dirty
+        self.update(old_dirty.united(dirty))
+
+    def _set_opacity(self, value):
+        self.opacity = value
+        self.update(self._dirty)
+
+    def _set_pulse(self, value):
+        self.pulse = value
+        self.update(self._dirty)
+
+    def _window_event(self, event, info):
+        if info.hwnd == self.target_hwnd:
+            self.target_event.emit(event)
+
+    def _on_target_event(self, event):
+        if event == window_provider.DESTROYED or event == window_provider.HIDDEN:
+            self.hide_overlay()
+        elif self.isVisible():
+            self.reposition_to_target()
 
     def reposition_to_target(self):
         if not self.target_hwnd:
             return
-        try:
-            rect = win32gui.GetWindowRect(self.target_hwnd)
-            self.setGeometry(rect[0], rect[1], rect[2]-rect[0], rect[3]-rect[1])
-        except Exception as e:
-            print("Overlay reposition error:", e)
+        rect = self.windows.get_rect(self.target_hwnd)
+        if rect is None:
+            print("Overlay reposition error: target window is gone")
+            return
+        geometry = QRect(rect[0], rect[1], rect[2]-rect[0], rect[3]-rect[1])
+        if geometry != self.geometry():
+            self.setGeometry(geometry)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._relayout()
 
     def show_forever(self):
         self.reposition_to_target()
@@ -47,38 +182,100 @@ class Overlay(QWidget):
     def hide_overlay(self):
         self.hide()
         self.boxes = []
-        self.timer.stop()
+        self._rects = []
+        self.fade.stop()
+        self.fade_delay.stop()
+        self.pulser.stop()
 
-    def fade_boxes(self):
-        """Gradually reduce alpha for fade effect"""
-        updated = False
-        for b in self.boxes:
-            if b[5] > 0:
-                b[5] = max(0, b[5]-15)
-                updated = True
-        if not updated:
-            self.timer.stop()
-            self.boxes = []
-            self.hide()
-        self.update()
+    def paint_stats(self):
+        """Histogram of paint times (ms); populated while tracing is enabled."""
+        return tracing.histogram("overlay.paint").snapshot()
 
     def paintEvent(self, event):
-        if not self.boxes:
+        if not self._rects:
             return
+        start = time.perf_counter()
         painter = QPainter(self)
-        width, height = self.img_size
-        win_w, win_h = self.width(), self.height()
-        x_scale = win_w / width
-        y_scale = win_h / height
-
-        for b in self.boxes:
-            x1, y1, x2, y2, label, alpha = b
-            pen = QPen(QColor(255, 0, 0, alpha), 3)
-            painter.setPen(pen)
-            rect = QRect(int(x1*x_scale), int(y1*y_scale), int((x2-x1)*x_scale), int((y2-y1)*y_scale))
-            painter.drawRect(rect)
-            painter.setPen(QColor(255, 255, 255, alpha))
-            font = QFont()
-            font.setPointSize(10)
-            painter.setFont(font)
-            painter.drawText(rect.topLeft(), label)
+        painter.setRenderHint(QPainter.Antialiasing, self.style in ("pulse", "arrow", "steps"))
+        painter.setOpacity(self.opacity)
+
+        grow = int(self.pulse * 6)
+        self._box_pen.setWidth(3 + (int(self.pulse * 3) if self.style == "pulse" else 0))
+
+        for i, (x, y, w, h) in enumerate(self._rects):
+            painter.setPen(self._box_pen)
+            painter.setBrush(Qt.NoBrush)
+            if self.style == "pulse":
+                painter.drawRect(x - grow, y - grow, w + 2 * grow, h + 2 * grow)
+            else:
+                painter.drawRect(x, y, w, h)
+
+            if self.style == "arrow":
+                painter.setPen(self._no_pen)
+                painter.setBrush(self._red_brush)
+                painter.drawPolygon(self._arrows[i])
+
+            if self.style == "steps":
+                painter.setPen(self._no_pen)
+                painter.setBrush(self._red_brush)
+                painter.drawEllipse(x - 22, y - 22, 20, 20)
+                painter.setPen(self._text_pen)
+                painter.setFont(self._step_font)
+                painter.drawStaticText(x - 12 - self._steps[i].size().width() / 2, y - 21, self._steps[i])
+            else:
+                painter.setPen(self._text_pen)
+                painter.setFont(self._font)
+                painter.drawStaticText(x, y - 18, self._labels[i])
+
+        painter.end()
+        self.last_paint_ms = (time.perf_counter() - start) * 1000
+        if tracing.enabled():
+            tracing.histogram("overlay.paint").observe(self.last_paint_ms)
+
+
+class OverlayTracker(QObject):
+    """
+    Keeps the overlay's boxes on their buttons while Word scrolls, moves or
+    resizes: every `interval` ms each box is relocated by its TemplateTracker
+    in a small screen grab around its last position. Emits `lost` (and
+    stops) when a match gets too weak, so the detector can run again.
+    """
+    lost = pyqtSignal()
+
+    def __init__(self, overlay, trackers, interval=100):
+        super().__init__()
+        self.overlay = overlay
+        self.trackers = trackers
+        self.timer = QTimer()
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.tick)
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def tick(self):
+        if not self.overlay.isVisible() or not self.overlay.boxes:
+            self.stop()
+            return
+        rect = self.overlay.windows.get_rect(self.overlay.target_hwnd)
+        if rect is None:
+            self.stop()
+            return
+        left, top, right, bottom = rect
+
+        size = (right - left, bottom - top)
+        boxes = []
+        for tracker in self.trackers:
+            x0, y0, x1, y1 = tracker.search_region(size)
+            region = grab_region((left + x0, top + y0, left + x1, top + y1)) if x1 > x0 and y1 > y0 else None
+            box = tracker.update(region, (x0, y0))
+            if box is None:
+                self.stop()
+                self.lost.emit()
+                return
+            boxes.append(box)
+
+        self.overlay.move_boxes(boxes, size)
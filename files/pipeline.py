@@ -0,0 +1,212 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError as FutureTimeout
+
+import tracing
+
+
+class Cancelled(Exception):
+    """Raised inside a pipeline run once its token has been cancelled."""
+
+
+class CancelToken:
+    """Shared flag a newer query uses to tell a stale one to stop."""
+
+    def __init__(self, parent=None):
+        self._event = threading.Event()
+        self._parent = parent
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set() or (self._parent is not None and self._parent.cancelled)
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled()
+
+    def child(self):
+        """A token that is cancelled with this one, but can also be cancelled on its own."""
+        return CancelToken(parent=self)
+
+
+# -------------------------
+# Query pipeline (no Qt here, runs on a worker thread)
+# -------------------------
+class AssistantPipeline:
+    """
+    The question -> label -> capture -> detect sequence behind ChatWindow.on_send.
+
+    Every stage is a plain callable so the pipeline can run on a worker
+    thread, or headless with stand-ins. `report(text)` is called with the
+    progress messages that end up as chat bubbles.
+
+    With `speculative`, capture and an unfiltered detection start on a
+    helper thread while the label is still being resolved; the label
+    filter is applied once both are done, so a query takes about as long
+    as the slower of the two paths instead of their sum. Given
+    `window_state` (hwnd -> (is_foreground, rect)), the helper first waits
+    up to `settle_timeout` seconds for the window to be in front with the
+    same rect on two reads in a row, so it doesn't grab Word mid-maximize;
+    if it never settles, the query captures after the label as usual.
+
+    With an `archive` (ScreenshotArchive), every located frame is handed
+    to it together with the query and every detection in it (not just the
+    label's); it writes them later.
+    """
+
+    SETTLE_POLL_S = 0.03
+    WAIT_SLICE_S = 0.05
+
+    def __init__(self, engine, capture, detect, archive=None, speculative=False, window_state=None,
+                 settle_timeout=0.5):
+        self.engine = engine
+        self.capture = capture          # hwnd -> Frame or None
+        self.detect = detect            # (frame, filter_labels or None for all) -> [detection, ...]
+        self.archive = archive
+        self.speculative = speculative
+        self.window_state = window_state
+        self.settle_timeout = settle_timeout
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculative") if speculative else None
+
+    def run(self, user_query, hwnd, token, report):
+        """
+        Returns {"label", "detections", "frame"} on success or
+        {"message": "..."} when there is nothing to highlight.
+        Raises Cancelled if `token` is cancelled between stages.
+        """
+        scan = None
+        if self.speculative:
+            scan_token = token.child()
+            scan = self._executor.submit(self._scan, hwnd, scan_token, tracing.current_trace())
+
+        try:
+            with tracing.span("llm"):
+                response = self.engine.query(user_query)
+            token.check()
+        except BaseException:
+            if scan:
+                self._abandon(scan, scan_token)
+            raise
+
+        label_name = response.get("label")
+        intent = response.get("intent", user_query)
+        # Tab header to show instead when the button is on a tab that isn't open
+        tab_label = response.get("tab_label")
+        report(f"🧠 Intent: {intent}\n🔗 Label: {label_name}\n")
+
+        if not label_name:
+            if scan:
+                self._abandon(scan, scan_token)
+            return {"message": "⚠️ I couldn’t map this to a feature."}
+
+        if scan is not None:
+            with tracing.span("speculative.wait"):
+                try:
+                    scanned = self._wait(scan, token)
+                except CancelledError:
+                    raise Cancelled()
+                except Cancelled:
+                    self._abandon(scan, scan_token)
+                    raise
+            token.check()
+            if scanned is None:
+                scan = None  # the window never settled
+        if scan is None:
+            result = self.locate(label_name, hwnd, token, tab_label=tab_label, query=user_query)
+        else:
+            frame, detections = scanned
+            if frame is None:
+                return {"message": "❌ Failed to capture Word window."}
+            self._archive(frame, detections, user_query, label_name)
+            result = self._result(label_name, frame, detections, tab_label)
+
+        if "pending_label" in result:
+            report(f"📑 '{label_name}' is on the {response.get('tabs')} tab; open that tab first.")
+        return result
+
+    @classmethod
+    def _wait(cls, scan, token):
+        # In slices, so a newer query doesn't have to wait for a capture it no longer needs
+        while True:
+            try:
+                return scan.result(timeout=cls.WAIT_SLICE_S)
+            except FutureTimeout:
+                token.check()
+
+    def _scan(self, hwnd, token, trace):
+        """
+        Speculative half of run(): capture and detect everything, on a helper
+        thread. Returns None if the window did not settle in time.
+        """
+        with tracing.activate(trace):
+            token.check()
+            if self.window_state is not None:
+                with tracing.span("settle", speculative=True):
+                    if not self._settled(hwnd, token):
+                        return None
+            with tracing.span("capture", speculative=True):
+                frame = self.capture(hwnd)
+            if frame is None:
+                return None, []
+            token.check()
+            with tracing.span("detect", speculative=True):
+                return frame, self.detect(frame, None)
+
+    def _settled(self, hwnd, token):
+        """True once `hwnd` is in the foreground with the same rect on two reads in a row."""
+        deadline = time.monotonic() + self.settle_timeout
+        last = None
+        while True:
+            token.check()
+            foreground, rect = self.window_state(hwnd)
+            if foreground and rect is not None and rect == last:
+                return True
+            last = rect if foreground else None
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.SETTLE_POLL_S)
+
+    @staticmethod
+    def _abandon(scan, scan_token):
+        # Not started yet: drop it; running: it stops at its next check
+        scan_token.cancel()
+        scan.cancel()
+
+    def _archive(self, frame, detections, query, label_name):
+        # Only queues a copy; encoding and writing happen on the archive's thread
+        if self.archive is not None:
+            self.archive.record(frame, detections, query=query, label=label_name)
+
+    def locate(self, label_name, hwnd, token, tab_label=None, query=None):
+        """
+        Capture the window and find `label_name` in it; same results as run().
+        If only `tab_label` is found, that tab is returned with the button
+        as "pending_label".
+        """
+        with tracing.span("capture"):
+            frame = self.capture(hwnd)
+        if frame is None:
+            return {"message": "❌ Failed to capture Word window."}
+        token.check()
+
+        # Unfiltered, like the speculative path: the archive keeps every box of
+        # the frame, and _result picks out the label (filtering is after inference anyway)
+        with tracing.span("detect"):
+            detections = self.detect(frame, None)
+        token.check()
+        self._archive(frame, detections, query, label_name)
+        return self._result(label_name, frame, detections, tab_label)
+
+    @staticmethod
+    def _result(label_name, frame, detections, tab_label=None):
+        hits = [d for d in detections if d['label'] == label_name]
+        if hits:
+            return {"label": label_name, "detections": hits, "frame": frame}
+
+        tab_hits = [d for d in detections if tab_label and d['label'] == tab_label]
+        if tab_hits:
+            return {"label": tab_label, "detections": tab_hits, "frame": frame, "pending_label": label_name}
+        return {"message": f"ℹ️ No '{label_name}' detected."}
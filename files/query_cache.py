@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from label_index import normalize_text
+
+
+def make_key(user_text, model_name, fingerprint):
+    """Cache key for a query: normalized text + model + label/hint fingerprint."""
+    raw = "\x1f".join([normalize_text(user_text), model_name, fingerprint])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class QueryCache:
+    """
+    Two-tier cache for SmartLLMEngine.query results.
+
+    Tier 1 is an in-memory LRU (`max_memory` entries). Tier 2 is an optional
+    SQLite file at `path`, bounded to `max_disk` rows, so answers survive a
+    restart. Entries older than `ttl` seconds are ignored and dropped.
+    Everything stored under another fingerprint is purged when
+    `set_fingerprint` sees a new one.
+    """
+
+    def __init__(self, path=None, max_memory=256, max_disk=5000, ttl=7 * 24 * 3600):
+        self.path = path
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.ttl = ttl
+        self.fingerprint = None
+
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, fingerprint TEXT, value TEXT,"
+                " stored_at REAL, used_at REAL)"
+            )
+            self._db.commit()
+
+    def set_fingerprint(self, fingerprint):
+        """Drop every entry that was computed for a different label set/hints."""
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return
+            self.fingerprint = fingerprint
+            self._memory.clear()
+            if self._db:
+                self._db.execute("DELETE FROM entries WHERE fingerprint != ?", (fingerprint,))
+                self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                stored_at, value = item
+                if now - stored_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db:
+                row = self._db.execute(
+                    "SELECT value, stored_at FROM entries WHERE key = ? AND fingerprint = ?",
+                    (key, self.fingerprint),
+                ).fetchone()
+                if row and now - row[1] <= self.ttl:
+                    value = json.loads(row[0])
+                    self._db.execute("UPDATE entries SET used_at = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+                if row:
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                    (key, self.fingerprint, json.dumps(value), now, now),
+                )
+                count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                if count > self.max_disk:
+                    self._db.execute(
+                        "DELETE FROM entries WHERE key IN ("
+                        " SELECT key FROM entries ORDER BY used_at ASC LIMIT ?)",
+                        (count - self.max_disk,),
+                    )
+                    self.evictions += count - self.max_disk
+                self._db.commit()
+
+    def _remember(self, key, stored_at, value):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
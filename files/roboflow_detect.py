@@ -1,32 +1,53 @@
-from roboflow import Roboflow
 import cv2
-import os
-
-# Initialize Roboflow model once
-api_key = os.environ.get("ROBOFLOW_API_KEY", "apikeyXXXX")
-try:
-    rf = Roboflow(api_key=api_key)
-    project = rf.workspace("ui-elements-t9wim").project("ui-elements-u0wsn")
-    model = project.version("6").model  # Version 6
-except Exception as e:
-    print("❌ Roboflow initialization failed:", e)
-    rf = None
-    model = None
-
-def detect_objects(image_path, confidence=0.50, save_annotated_path=None, filter_labels=None):
+
+import tracing
+from detector_backends import get_backend
+from roi import predict_ribbon
+
+def detect_objects(image, confidence=0.50, save_annotated_path=None, filter_labels=None, backend=None, cache=None,
+                   roi=False, tile=False):
     """
-    Detect UI elements in a given image using Roboflow online model.
+    Detect UI elements in a given image: a captured Frame, a BGR ndarray or a file path.
+    Uses `backend` if given, otherwise the one selected by $URA_DETECTOR
+    (hosted Roboflow model by default, "local" for on-CPU YOLO/ONNX).
     Only returns objects in `filter_labels` if provided.
+    With a DetectionCache, an unchanged ribbon is answered without inference.
+    With `roi`, only the ribbon band is sent to the model (split into
+    native-resolution tiles with `tile`); boxes come back in full-image pixels.
     """
-    prediction = model.predict(image_path, confidence=confidence).json()
-    detections = []
+    if backend is None:
+        backend = get_backend()
 
-    img = cv2.imread(image_path)
-    if img is None:
-        print("❌ Failed to read image:", image_path)
-        return []
+    # In-memory frames go straight to the model; only paths are decoded here
+    partial = getattr(image, "partial", False)
+    image = getattr(image, "image", image)
+    if isinstance(image, str):
+        img = cv2.imread(image)
+        if img is None:
+            print("❌ Failed to read image:", image)
+            return []
+    else:
+        img = image
+
+    predictions = None
+    if cache is not None:
+        with tracing.span("detect.cache"):
+            cache_key = cache.key_for(img, confidence, roi=roi, tile=tile, partial=partial)
+            predictions = cache.get(cache_key)
+    if predictions is None:
+        # Cache everything, so later questions about other buttons hit too
+        with tracing.span("detect.predict", backend=backend.name, roi=roi):
+            if roi:
+                predictions = predict_ribbon(backend, img, confidence=confidence, tile=tile)
+            else:
+                predictions = backend.predict(img, confidence=confidence)
+        if cache is not None:
+            cache.put(cache_key, predictions)
+    detections = []
+    if save_annotated_path:
+        img = img.copy()  # don't draw on the caller's frame
 
-    for obj in prediction['predictions']:
+    for obj in predictions:
         label = obj['class']
         if filter_labels and label not in filter_labels:
             continue
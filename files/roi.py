@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+
+
+# -------------------------
+# Ribbon band
+# -------------------------
+def find_ribbon_band(image, min_fraction=0.06, max_fraction=0.35, fallback_fraction=0.22):
+    """
+    Return (y0, y1) of the band holding the title bar, tabs and ribbon.
+
+    The ribbon is closed off by a horizontal border line (ribbon / ruler /
+    page edge), so the band ends at the lowest row in the top `max_fraction`
+    of the window where most columns change brightness sharply. Falls back
+    to the top `fallback_fraction` when no such line is found.
+    """
+    height = image.shape[0]
+    lo = int(height * min_fraction)
+    hi = max(lo + 1, int(height * max_fraction))
+
+    top = image[:hi + 1]
+    if top.ndim == 3:
+        top = cv2.cvtColor(top, cv2.COLOR_BGR2GRAY)
+    top = top.astype(np.int16)
+    row_change = np.abs(np.diff(top, axis=0)) > 12
+    line_rows = np.flatnonzero(row_change.mean(axis=1) > 0.6)
+    line_rows = line_rows[line_rows >= lo]
+
+    if len(line_rows):
+        y1 = int(line_rows[-1]) + 2
+    else:
+        y1 = int(height * fallback_fraction)
+    return 0, min(height, y1)
+
+
+def make_tiles(width, height, tile_size=640, overlap=64):
+    """Split a width x height area into overlapping tiles of at most tile_size."""
+    def spans(length):
+        if length <= tile_size:
+            return [(0, length)]
+        step = tile_size - overlap
+        starts = list(range(0, length - tile_size, step)) + [length - tile_size]
+        return [(s, s + tile_size) for s in starts]
+
+    return [(x0, y0, x1, y1) for y0, y1 in spans(height) for x0, x1 in spans(width)]
+
+
+# -------------------------
+# Prediction helpers (Roboflow format, centre coordinates)
+# -------------------------
+def _corners(p):
+    return p['x'] - p['width'] / 2, p['y'] - p['height'] / 2, p['x'] + p['width'] / 2, p['y'] + p['height'] / 2
+
+
+def iou(a, b):
+    ax1, ay1, ax2, ay2 = _corners(a)
+    bx1, by1, bx2, by2 = _corners(b)
+    iw = max(0.0, min(ax2, bx2) - max(ax1, bx1))
+    ih = max(0.0, min(ay2, by2) - max(ay1, by1))
+    inter = iw * ih
+    union = a['width'] * a['height'] + b['width'] * b['height'] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def merge_predictions(predictions, iou_threshold=0.5):
+    """Per-class non-maximum suppression, for boxes seen by two overlapping tiles."""
+    kept = []
+    for p in sorted(predictions, key=lambda p: p['confidence'], reverse=True):
+        if all(k['class'] != p['class'] or iou(k, p) < iou_threshold for k in kept):
+            kept.append(p)
+    return kept
+
+
+# -------------------------
+# ROI inference
+# -------------------------
+def predict_ribbon(backend, image, confidence=0.50, tile=False, tile_size=640, overlap=64):
+    """
+    Run `backend` on the ribbon band only (optionally tiled at native
+    resolution, which helps small icons) and return predictions in
+    full-window coordinates.
+    """
+    y0, y1 = find_ribbon_band(image)
+    band = image[y0:y1]
+
+    if not tile:
+        regions = [(0, 0, band.shape[1], band.shape[0])]
+    else:
+        regions = make_tiles(band.shape[1], band.shape[0], tile_size=tile_size, overlap=overlap)
+
+    predictions = []
+    for x0, ty0, x1, ty1 in regions:
+        crop = np.ascontiguousarray(band[ty0:ty1, x0:x1])
+        for p in backend.predict(crop, confidence=confidence):
+            p = dict(p)
+            p['x'] += x0
+            p['y'] += y0 + ty0
+            predictions.append(p)
+
+    if len(regions) > 1:
+        predictions = merge_predictions(predictions)
+    return predictions
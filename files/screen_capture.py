@@ -1,10 +1,12 @@
-import win32gui
 import cv2
-from PIL import ImageGrab
-import numpy as np
+import ctypes
 import os
 import sys
 
+from capture_backends import get_capture_backend
+from frame import Frame
+from window_provider import get_window_provider
+
 def resource_path(relative_path):
     """
     Get absolute path to resource.
@@ -25,33 +27,72 @@ def get_save_dir():
     os.makedirs(save_dir, exist_ok=True)
     return save_dir
 
-def capture_word_window(hwnd, filename="latest_word.png", exclude_widget=None):
-    if not hwnd:
+WDA_EXCLUDEFROMCAPTURE = 0x11
+
+def exclude_from_capture(widget):
+    """
+    Keep one of our own windows out of every screenshot (Windows 10 2004+).
+    Returns False when the OS doesn't support it.
+    """
+    try:
+        return bool(ctypes.windll.user32.SetWindowDisplayAffinity(int(widget.winId()), WDA_EXCLUDEFROMCAPTURE))
+    except Exception:
         return False
 
+def grab_region(bbox, backend=None):
+    """
+    Capture a screen rectangle (x1, y1, x2, y2) as a BGR ndarray, or None.
+    The array is the backend's reused buffer (see CaptureBackend.grab).
+    """
+    try:
+        return (backend or get_capture_backend()).grab(bbox)
+    except Exception as e:
+        print("❌ Error capturing region:", e)
+        return None
+
+def grab_word_frame(hwnd, exclude_widget=None, save_path=None, windows=None, top_fraction=None, backend=None):
+    """
+    Capture the window as an in-memory Frame. Nothing touches the disk
+    unless `save_path` is given. With `top_fraction`, only that top part
+    of the window (the ribbon) is grabbed. Returns None on failure.
+
+    `exclude_widget` is hidden during the grab; only needed when the
+    capture backend can't leave it out by itself.
+    """
+    if not hwnd:
+        return None
+    rect = (windows or get_window_provider()).get_rect(hwnd)
+    if rect is None:
+        print("❌ Word window is gone")
+        return None
+
     try:
         if exclude_widget:
             exclude_widget.hide()  # hide the bot GUI while capturing
 
-        # Get window rectangle and capture it
-        x, y, x1, y1 = win32gui.GetWindowRect(hwnd)
-        img = ImageGrab.grab(bbox=(x, y, x1, y1))
-        frame = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-
-        # Construct a safe save path
-        save_dir = get_save_dir()
-        save_path = os.path.join(save_dir, filename)
+        # Capture the window rectangle, or just its top band
+        x, y, x1, y1 = rect
+        bottom = y + int((y1 - y) * top_fraction) if top_fraction else y1
+        image = (backend or get_capture_backend()).grab((x, y, x1, bottom))
+        if image is None:
+            raise ValueError(f"empty window rectangle {rect}")
+        frame = Frame(image, origin=(x, y), hwnd=hwnd, window_size=(x1 - x, y1 - y))
 
-        # Write the image
-        cv2.imwrite(save_path, frame)
-        print(f"✅ Screenshot saved at: {save_path}")
+        if save_path:
+            cv2.imwrite(save_path, frame.image)
+            print(f"✅ Screenshot saved at: {save_path}")
 
         if exclude_widget:
             exclude_widget.show()  # show the bot GUI again
-        return True
+        return frame
 
     except Exception as e:
         print("❌ Error capturing Word window:", e)
         if exclude_widget:
             exclude_widget.show()
-        return False
+        return None
+
+def capture_word_window(hwnd, filename="latest_word.png", exclude_widget=None):
+    # Construct a safe save path
+    save_path = os.path.join(get_save_dir(), filename)
+    return grab_word_frame(hwnd, exclude_widget=exclude_widget, save_path=save_path) is not None
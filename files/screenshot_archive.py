@@ -0,0 +1,210 @@
+"""
+Ring buffer of recent captures with what was asked and detected, written
+by a background thread so queries never wait on an image encode.
+
+    archive = ScreenshotArchive("screenshots", capacity=200, encoding="jpg")
+    archive.record(frame, detections, query="insert a table", label="icon_table")
+
+Each entry is <seq>.<ext> plus <seq>.json. Export for detector training:
+
+    python screenshot_archive.py screenshots --export dataset --labels ../assets/label_mapping.txt
+"""
+import argparse
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from roi import find_ribbon_band
+
+
+ENCODINGS = {
+    "jpg": (".jpg", [cv2.IMWRITE_JPEG_QUALITY, 90]),
+    "webp": (".webp", [cv2.IMWRITE_WEBP_QUALITY, 90]),
+    "png": (".png", [cv2.IMWRITE_PNG_COMPRESSION, 1]),
+    "npy": (".npy", None),  # raw pixels, no encode at all
+}
+
+
+class ScreenshotArchive:
+    """
+    Keeps the last `capacity` entries in `directory`, oldest deleted first.
+    record() copies the pixels and queues them; when the writer falls
+    behind by `queue_size` entries, new ones are dropped (and counted)
+    rather than slowing the caller. With `ribbon_only`, only the ribbon
+    band is stored.
+    """
+
+    def __init__(self, directory, capacity=200, encoding="jpg", ribbon_only=False, queue_size=8):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding '{encoding}', expected one of {sorted(ENCODINGS)}")
+        self.directory = directory
+        self.capacity = capacity
+        self.encoding = encoding
+        self.ribbon_only = ribbon_only
+        self.dropped = 0
+        self.written = 0
+        os.makedirs(directory, exist_ok=True)
+        self._entries = self._existing_entries()
+        self._seq = self._entries[-1] + 1 if self._entries else 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="screenshot-archive", daemon=True)
+        self._thread.start()
+
+    def _existing_entries(self):
+        seqs = []
+        for name in os.listdir(self.directory):
+            stem, ext = os.path.splitext(name)
+            if ext == ".json" and stem.isdigit():
+                seqs.append(int(stem))
+        return sorted(seqs)
+
+    def record(self, frame, detections, query=None, label=None):
+        """Queue a frame for writing; returns False if it was dropped."""
+        meta = {
+            "timestamp": getattr(frame, "timestamp", time.time()),
+            "query": query,
+            "label": label,
+            "window_size": list(getattr(frame, "window_size", ())),
+            "detections": [{"label": d["label"], "box": list(d["box"]), "confidence": d.get("confidence")}
+                           for d in detections],
+        }
+        image = getattr(frame, "image", frame)
+        try:
+            # Capture backends reuse their buffers, so the pixels must be copied now
+            self._queue.put_nowait((image.copy(), meta))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            try:
+                self._write(*item)
+            except Exception as e:
+                print("❌ Could not archive screenshot:", e)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, image, meta):
+        if self.ribbon_only:
+            _, y1 = find_ribbon_band(image)
+            image = image[:y1]
+            meta["detections"] = [d for d in meta["detections"] if d["box"][1] < y1]
+        meta["size"] = [image.shape[1], image.shape[0]]
+
+        seq = self._seq
+        self._seq += 1
+        ext, params = ENCODINGS[self.encoding]
+        meta["image"] = f"{seq:06d}{ext}"
+        path = os.path.join(self.directory, meta["image"])
+        if params is None:
+            np.save(path, image)
+        elif not cv2.imwrite(path, image, params):
+            raise OSError(f"cv2.imwrite failed for {path}")
+        # The JSON goes last: an entry only counts once it is complete
+        with open(os.path.join(self.directory, f"{seq:06d}.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        self._entries.append(seq)
+        self.written += 1
+        while len(self._entries) > self.capacity:
+            self._evict(self._entries.pop(0))
+
+    def _evict(self, seq):
+        stem = os.path.join(self.directory, f"{seq:06d}")
+        for ext in [".json"] + [e for e, _ in ENCODINGS.values()]:
+            if os.path.exists(stem + ext):
+                os.remove(stem + ext)
+
+    def flush(self):
+        """Wait until everything queued so far is on disk."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+def load_entries(directory):
+    """Metadata of every complete entry in `directory`, oldest first."""
+    entries = []
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        if ext == ".json" and stem.isdigit():
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                entries.append(json.load(f))
+    return entries
+
+
+def export_yolo(directory, out_dir, class_names=None):
+    """
+    Write the archive as a YOLO dataset: images/, labels/ with one
+    "class cx cy w h" line (normalized) per detection, and data.yaml.
+    `class_names` fixes the class ids; by default every label seen, sorted.
+    Returns the number of images exported.
+    """
+    entries = load_entries(directory)
+    if class_names is None:
+        class_names = sorted({d["label"] for e in entries for d in e["detections"]})
+    class_ids = {name: i for i, name in enumerate(class_names)}
+
+    os.makedirs(os.path.join(out_dir, "images"), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, "labels"), exist_ok=True)
+    for entry in entries:
+        stem, ext = os.path.splitext(entry["image"])
+        src = os.path.join(directory, entry["image"])
+        if ext == ".npy":
+            ext = ".png"
+            cv2.imwrite(os.path.join(out_dir, "images", stem + ext), np.load(src))
+        else:
+            shutil.copyfile(src, os.path.join(out_dir, "images", stem + ext))
+
+        width, height = entry["size"]
+        lines = []
+        for d in entry["detections"]:
+            if d["label"] not in class_ids:
+                continue
+            x1, y1, x2, y2 = d["box"]
+            x1, x2 = max(0, x1), min(width, x2)
+            y1, y2 = max(0, y1), min(height, y2)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            lines.append(f"{class_ids[d['label']]} {(x1 + x2) / 2 / width:.6f} {(y1 + y2) / 2 / height:.6f} "
+                         f"{(x2 - x1) / width:.6f} {(y2 - y1) / height:.6f}")
+        with open(os.path.join(out_dir, "labels", stem + ".txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + ("\n" if lines else ""))
+
+    with open(os.path.join(out_dir, "data.yaml"), "w", encoding="utf-8") as f:
+        f.write(f"path: {os.path.abspath(out_dir)}\ntrain: images\nval: images\n")
+        f.write(f"nc: {len(class_names)}\nnames: {json.dumps(class_names)}\n")
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the screenshot archive as a YOLO dataset")
+    parser.add_argument("directory", help="archive directory (e.g. screenshots)")
+    parser.add_argument("--export", required=True, help="output dataset directory")
+    parser.add_argument("--labels", help="label_mapping.txt, to use its order as class ids")
+    args = parser.parse_args()
+
+    class_names = None
+    if args.labels:
+        with open(args.labels, "r", encoding="utf-8") as f:
+            class_names = [line.strip().lstrip("- ").strip() for line in f if line.strip()]
+    count = export_yolo(args.directory, args.export, class_names)
+    print(f"✅ Exported {count} images to {args.export}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import zlib
+
+import numpy as np
+
+from label_index import char_ngrams, content_words, normalize_text
+
+
+# -------------------------
+# Embedders
+# -------------------------
+class HashedNgramEmbedder:
+    """
+    Offline embedder: character trigrams and words hashed into `dim`
+    signed buckets, L2-normalized. Deterministic across runs and machines.
+    """
+
+    def __init__(self, dim=256, n=3, word_weight=2.0):
+        self.dim = dim
+        self.n = n
+        self.word_weight = word_weight
+
+    @property
+    def id(self):
+        return f"hashed-ngram-{self.dim}-{self.n}-{self.word_weight}"
+
+    def _features(self, text):
+        text = normalize_text(text)
+        features = [(g, 1.0) for g in char_ngrams(text, self.n)] if text else []
+        features += [("w:" + w, self.word_weight) for w in content_words(text)]
+        return features
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                vectors[row, h % self.dim] += sign * weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+class OllamaEmbedder:
+    """Embeddings from a local Ollama embedding model (e.g. nomic-embed-text)."""
+
+    def __init__(self, client, model="nomic-embed-text"):
+        self.client = client
+        self.model = model
+
+    @property
+    def id(self):
+        return f"ollama-{self.model}"
+
+    def embed(self, texts):
+        vectors = np.asarray(self.client.embed(self.model, list(texts)), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+# -------------------------
+# Matcher
+# -------------------------
+class SemanticLabelMatcher:
+    """
+    One row per label: the normalized sum of its hint embeddings (plus the
+    label name itself). A query is scored against every label with a single
+    matrix-vector product. With `cache_dir`, the matrix is saved as .npy
+    keyed by a hash of the hints and the embedder, and memory-mapped on the
+    next start instead of being recomputed.
+    """
+
+    def __init__(self, hints, labels=None, embedder=None, cache_dir=None):
+        self.embedder = embedder or HashedNgramEmbedder()
+        allowed = set(labels) if labels is not None else None
+        self.labels = sorted(l for l in hints if allowed is None or l in allowed)
+
+        payload = json.dumps({l: hints[l] for l in self.labels}, sort_keys=True)
+        self.key = hashlib.sha1((self.embedder.id + payload).encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(cache_dir, f"label_vectors_{self.key}.npy") if cache_dir else None
+
+        if self.path and os.path.exists(self.path):
+            self.matrix = np.load(self.path, mmap_mode="r")
+        else:
+            self.matrix = self._build(hints)
+            if self.path:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp_path = self.path + ".tmp.npy"
+                np.save(tmp_path, self.matrix)
+                os.replace(tmp_path, self.path)
+
+    def _build(self, hints):
+        texts, owners = [], []
+        for i, label in enumerate(self.labels):
+            for text in [label.replace("_", " ")] + list(hints[label]):
+                texts.append(text)
+                owners.append(i)
+        if not texts:
+            return np.zeros((0, getattr(self.embedder, "dim", 1)), dtype=np.float32)
+        vectors = self.embedder.embed(texts)
+
+        matrix = np.zeros((len(self.labels), vectors.shape[1]), dtype=np.float32)
+        np.add.at(matrix, np.asarray(owners), vectors)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def search(self, user_text, k=5):
+        """Top-k labels as [(label, cosine score), ...], best first."""
+        if not len(self.labels) or not normalize_text(user_text):
+            return []
+        query = self.embedder.embed([user_text])[0]
+        scores = self.matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.labels[i], round(float(scores[i]), 4)) for i in top if scores[i] > 0]
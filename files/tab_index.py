@@ -0,0 +1,41 @@
+import hashlib
+import json
+import os
+
+
+class TabIndex:
+    """
+    Which ribbon tab every label lives on, from label_tabs.json:
+
+        {"tabs": {"Insert": {"inactive": "tab_insert_inactive", "active": ...}, ...},
+         "labels": {"icon_table": "Insert", ...}}
+
+    A missing file gives an empty index (every lookup returns None).
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.tabs = {}
+        self.labels = {}
+        self.hash = ""
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            parsed = json.loads(data.decode("utf-8"))
+            self.tabs = parsed.get("tabs", {})
+            self.labels = parsed.get("labels", {})
+            self.hash = hashlib.sha1(data).hexdigest()
+
+    def __len__(self):
+        return len(self.labels)
+
+    def tab_for(self, label):
+        """Tab name for `label` ("Insert"), or None when unknown."""
+        return self.labels.get(label)
+
+    def tab_label(self, tab, state="inactive"):
+        """Detector label of the tab header, e.g. tab_insert_inactive; None when there is none."""
+        for name, states in self.tabs.items():
+            if name.lower() == (tab or "").lower():
+                return states.get(state)
+        return None
@@ -0,0 +1,239 @@
+"""
+Checks for the pieces that have fakes: run with `python -m pytest -q` from files/.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+import pytest
+
+import batch_run
+from detection_cache import DetectionCache
+from fake_ollama import FakeOllamaServer
+from frame import synthetic_word_frame
+from json_stream import JSONObjectScanner
+from llm_engine import SmartLLMEngine
+from llm_scheduler import LLMScheduler
+from model_manager import DEGRADED, READY, UNAVAILABLE, ModelManager
+from ollama_client import OllamaCLIClient, OllamaError, OllamaHTTPClient, OllamaUnavailable
+from query_cache import QueryCache
+
+LABELS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "label_mapping.txt")
+
+
+# -------------------------
+# Engine
+# -------------------------
+def test_failed_gemma_answer_is_not_cached():
+    with FakeOllamaServer(response='{"tab": "Design"}') as server:
+        # direct_threshold above any score: every query goes to Gemma
+        engine = SmartLLMEngine(label_list_path=LABELS, client=OllamaHTTPClient(host=server.url),
+                                cache=QueryCache(), direct_threshold=2.0)
+        server.fail(1)
+        first = engine.query("make my heading look fancier")
+        assert first["source"] == "fallback"
+
+        calls = len(server.requests)
+        second = engine.query("make my heading look fancier")
+        assert second["source"] == "gemma"
+        assert second["tabs"] == "Design"
+        assert len(server.requests) > calls
+
+
+# -------------------------
+# Detection cache
+# -------------------------
+def test_detection_cache_misses_when_one_icon_changes():
+    cache = DetectionCache()
+    frame = synthetic_word_frame()
+    cache.put(cache.key_for(frame, 0.5), [{"label": "icon_bold", "box": [0, 0, 10, 10], "confidence": 0.9}])
+    assert cache.get(cache.key_for(frame.copy(), 0.5)) is not None
+
+    for x, y in ((100, 60), (900, 120), (1700, 90)):
+        changed = frame.copy()
+        changed[y:y + 24, x:x + 24] = 243  # a button disappears
+        assert cache.get(cache.key_for(changed, 0.5)) is None
+
+
+# -------------------------
+# Ollama transports
+# -------------------------
+def test_cli_failure_is_unavailable():
+    crashing = OllamaCLIClient(command=(sys.executable, "-c", "import sys; print('partial'); sys.exit(3)"))
+    with pytest.raises(OllamaUnavailable):
+        "".join(crashing.stream("gemma:2b", "make text bold"))
+    with pytest.raises(OllamaUnavailable):
+        crashing.generate("gemma:2b", "make text bold")
+
+
+def test_cli_timeout_is_not_unavailable():
+    hanging = OllamaCLIClient(command=(sys.executable, "-c", "import time; time.sleep(10)"), timeout=0.3)
+    with pytest.raises(OllamaError) as raised:
+        "".join(hanging.stream("gemma:2b", "make text bold"))
+    assert not isinstance(raised.value, OllamaUnavailable)
+
+
+# -------------------------
+# Label index
+# -------------------------
+@pytest.fixture(scope="module")
+def engine():
+    with FakeOllamaServer() as server:
+        yield SmartLLMEngine(label_list_path=LABELS, client=OllamaHTTPClient(host=server.url), cache=QueryCache())
+
+
+@pytest.mark.parametrize("query, label", [
+    ("insert", "tab_insert_active"),
+    ("table", "icon_table"),
+    ("zoom", "icon_zoom"),
+])
+def test_single_common_word_still_matches(engine, query, label):
+    # Every trigram of these is too common to index; the stop grams and whole words still count
+    assert label in [name for name, _ in engine.label_index.search(query, k=3)]
+
+
+# -------------------------
+# Streamed JSON
+# -------------------------
+def test_json_scanner_waits_for_a_closed_object():
+    scanner = JSONObjectScanner()
+    assert scanner.feed('Sure! {"tab": "Ho') is None
+    assert scanner.feed('me", "note": "a } in a string') is None
+    assert scanner.feed('"} and more text') == {"tab": "Home", "note": "a } in a string"}
+
+
+def test_json_scanner_skips_an_object_that_does_not_parse():
+    scanner = JSONObjectScanner()
+    assert scanner.feed("{tab: Home} ") is None
+    assert scanner.feed('{"tab": "Insert"}') == {"tab": "Insert"}
+
+
+# -------------------------
+# Scheduler
+# -------------------------
+def test_identical_requests_are_coalesced():
+    scheduler = LLMScheduler()
+    release = threading.Event()
+    calls = []
+
+    def resolve():
+        calls.append(1)
+        release.wait(5)
+        return {"label": "icon_bold"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(scheduler.coalesce("make text bold", resolve)))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while scheduler.stats["coalesced"] < 2:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"label": "icon_bold"}] * 3
+
+
+# -------------------------
+# Model health
+# -------------------------
+class _Client:
+    def __init__(self):
+        self.down = False
+
+    def warm(self, model):
+        if self.down:
+            raise OllamaUnavailable("connection refused")
+
+    def loaded(self, model):
+        return True
+
+
+def test_model_health_transitions():
+    client = _Client()
+    model = ModelManager(client, "gemma:2b", failure_limit=2, retry_after=60, slow_ms=1000)
+    assert model.preload() and model.state == READY
+
+    model.record_success(2000)
+    assert model.state == DEGRADED
+    model.record_success(10)
+    assert model.state == READY
+
+    model.record_failure(OllamaError("boom"))
+    assert model.state == DEGRADED and model.usable()
+    model.record_failure(OllamaError("boom"))
+    assert model.state == UNAVAILABLE and not model.usable()
+
+    client.down = True
+    model.retry_after = 0
+    model.check()
+    assert model.state == UNAVAILABLE
+    client.down = False
+    model.check()
+    assert model.state == READY and model.failures == 0
+
+
+def test_only_one_caller_gets_the_retry():
+    model = ModelManager(_Client(), "gemma:2b", failure_limit=1, retry_after=0.05)
+    model.record_failure(OllamaError("boom"))
+    assert not model.usable()
+    time.sleep(0.06)
+
+    barrier = threading.Barrier(8)
+    answers = []
+
+    def ask():
+        barrier.wait()
+        answers.append(model.usable())
+
+    threads = [threading.Thread(target=ask) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert answers.count(True) == 1
+
+
+# -------------------------
+# Batch runs
+# -------------------------
+def _batch(image_dir, out, queries):
+    return batch_run.run_batch(str(image_dir), str(out), queries=queries, label_path=LABELS, offline=True,
+                               detector="fake", workers=1, chunk_size=2, report=lambda _: None)
+
+
+def _images(out):
+    with open(out, "r", encoding="utf-8") as f:
+        return [r for r in map(json.loads, f) if r["kind"] == "image"]
+
+
+def test_batch_resume_truncates_and_retries(tmp_path):
+    images = tmp_path / "shots"
+    images.mkdir()
+    for i in range(3):
+        cv2.imwrite(str(images / f"s{i}.png"), synthetic_word_frame(seed=i))
+    (images / "bad.png").write_text("not an image")
+    out = tmp_path / "results.jsonl"
+
+    summary = _batch(images, out, ["make text bold"])
+    assert (summary["images"], summary["errors"]) == (4, 1)
+
+    # An interrupted run leaves half a line behind
+    with open(out, "a", encoding="utf-8") as f:
+        f.write('{"kind": "image", "ima')
+    cv2.imwrite(str(images / "bad.png"), synthetic_word_frame(seed=9))
+    summary = _batch(images, out, ["make text bold"])
+    assert summary["run"]["images"] == 1  # only the failed one
+    assert (summary["images"], summary["errors"]) == (4, 0)
+    with open(out, "r", encoding="utf-8") as f:
+        assert all(json.loads(line) for line in f)
+
+    # A changed query set redoes everything; the newest record per image wins
+    summary = _batch(images, out, ["make text bold", "insert a table"])
+    assert summary["run"]["images"] == 4
+    assert summary["checked"] == 8
+    assert len(_images(out)) == 9
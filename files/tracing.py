@@ -0,0 +1,275 @@
+"""
+Lightweight per-stage tracing for the assistant pipeline.
+
+    with tracing.start_trace("query", text=user_query) as trace:
+        with tracing.span("llm"):
+            ...
+
+Spans feed in-process histograms and, when a path is configured, finished
+traces are appended to a JSONL file. Tracing is off unless URA_TRACE is set
+("1" for in-memory only, anything else is used as the JSONL path) or
+configure() is called; while off, span() returns a shared no-op object.
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+# -------------------------
+# Histograms
+# -------------------------
+class Histogram:
+    """Count/sum/min/max of durations plus the most recent samples for percentiles."""
+
+    def __init__(self, keep=1024):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+            self._recent.append(value)
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            count, total, lo, hi = self.count, self.total, self.min, self.max
+
+        def pct(q):
+            if not recent:
+                return None
+            return round(recent[min(len(recent) - 1, int(q / 100 * len(recent)))], 3)
+
+        return {
+            "count": count,
+            "mean_ms": round(total / count, 3) if count else None,
+            "min_ms": round(lo, 3) if lo is not None else None,
+            "max_ms": round(hi, 3) if hi is not None else None,
+            "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99),
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def histogram(name):
+    h = _histograms.get(name)
+    if h is None:
+        with _histograms_lock:
+            h = _histograms.setdefault(name, Histogram())
+    return h
+
+
+def histograms():
+    """Snapshot of every histogram, keyed by span name."""
+    return {name: h.snapshot() for name, h in list(_histograms.items())}
+
+
+# -------------------------
+# Traces and spans
+# -------------------------
+_enabled = False
+_exporter = None
+_local = threading.local()
+_trace_ids = itertools.count(1)
+_last_trace = None
+
+
+class JSONLExporter:
+    """Appends each finished trace as one JSON line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, trace):
+        line = json.dumps(trace.to_dict())
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class Trace:
+    def __init__(self, name, attrs):
+        self.id = next(_trace_ids)
+        self.name = name
+        self.attrs = attrs
+        self.start_wall = time.time()
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def breakdown(self):
+        """{span name: total ms} for the top-level stages of this trace, plus the total."""
+        result = {}
+        with self._lock:
+            for s in self.spans:
+                if s["depth"] == 1:
+                    result[s["name"]] = round(result.get(s["name"], 0.0) + s["duration_ms"], 1)
+        if self.duration_ms is not None:
+            result["total"] = round(self.duration_ms, 1)
+        return result
+
+    def to_dict(self):
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "start": self.start_wall,
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "attrs": self.attrs,
+            "spans": spans,
+        }
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "start", "trace", "depth")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.trace = getattr(_local, "trace", None)
+        self.depth = getattr(_local, "depth", 0) + 1
+        _local.depth = self.depth
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        _local.depth = self.depth - 1
+        duration = (end - self.start) * 1000
+        histogram(self.name).observe(duration)
+        if self.trace is not None:
+            record = {
+                "name": self.name,
+                "depth": self.depth,
+                "offset_ms": round((self.start - self.trace.start) * 1000, 3),
+                "duration_ms": round(duration, 3),
+            }
+            if self.attrs:
+                record["attrs"] = self.attrs
+            if exc_type is not None:
+                record["error"] = exc_type.__name__
+            self.trace.add(record)
+        return False
+
+
+class _RootSpan:
+    def __init__(self, name, attrs):
+        self.trace = Trace(name, attrs)
+
+    def __enter__(self):
+        self._saved = (getattr(_local, "trace", None), getattr(_local, "depth", 0))
+        _local.trace = self.trace
+        _local.depth = 0
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        global _last_trace
+        trace = self.trace
+        trace.duration_ms = (time.perf_counter() - trace.start) * 1000
+        _local.trace, _local.depth = self._saved
+        histogram(trace.name).observe(trace.duration_ms)
+        _last_trace = trace
+        if _exporter is not None:
+            try:
+                _exporter.export(trace)
+            except OSError as e:
+                print("❌ Trace export failed:", e)
+        return False
+
+
+class _Activation:
+    """Makes an existing trace current on another thread."""
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def __enter__(self):
+        self._saved = (getattr(_local, "trace", None), getattr(_local, "depth", 0))
+        _local.trace = self.trace
+        _local.depth = 0
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.trace, _local.depth = self._saved
+        return False
+
+
+class _Noop:
+    trace = None
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _Noop()
+
+
+def span(name, **attrs):
+    """Time a stage. Nested inside start_trace() it is also recorded on the trace."""
+    if not _enabled:
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def start_trace(name, **attrs):
+    """Open a trace for one request; yields the Trace (None when tracing is off)."""
+    if not _enabled:
+        return _NOOP
+    return _RootSpan(name, attrs)
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+def activate(trace):
+    """Attach spans made on this thread to `trace` (e.g. from a helper thread)."""
+    if not _enabled or trace is None:
+        return _NOOP
+    return _Activation(trace)
+
+
+def last_trace():
+    return _last_trace
+
+
+def enabled():
+    return _enabled
+
+
+def configure(enabled=True, path=None):
+    """Turn tracing on/off; with `path`, finished traces are appended there as JSONL."""
+    global _enabled, _exporter
+    _enabled = enabled
+    _exporter = JSONLExporter(path) if (enabled and path) else None
+
+
+_env = os.environ.get("URA_TRACE")
+if _env:
+    configure(True, None if _env == "1" else _env)
@@ -0,0 +1,54 @@
+import cv2
+
+
+class TemplateTracker:
+    """
+    Follows one detected button without the detector: the detected crop is
+    kept as a grayscale template and searched for with normalized
+    cross-correlation in a small window around its last position.
+
+    Coordinates are window pixels. The template is inset by a few pixels so
+    the highlight border drawn around the button doesn't end up in it.
+    """
+
+    def __init__(self, image, box, search_margin=60, min_score=0.75, inset=4):
+        x1, y1, x2, y2 = [int(v) for v in box[:4]]
+        if x2 - x1 <= 2 * inset or y2 - y1 <= 2 * inset:
+            inset = 0
+        crop = image[y1 + inset:y2 - inset, x1 + inset:x2 - inset]
+        self.template = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop.copy()
+        self.box = [x1, y1, x2, y2]
+        self.inset = inset
+        self.search_margin = search_margin
+        self.min_score = min_score
+        self.score = 1.0
+
+    def search_region(self, window_size):
+        """(x0, y0, x1, y1) in window pixels to grab for the next update."""
+        width, height = window_size
+        x1, y1, x2, y2 = self.box
+        m = self.search_margin
+        return max(0, x1 - m), max(0, y1 - m), min(width, x2 + m), min(height, y2 + m)
+
+    def update(self, region_image, region_origin):
+        """
+        Locate the template in `region_image` (grabbed at `region_origin`).
+        Returns the new [x1, y1, x2, y2], or None when the match is too weak
+        and the detector should run again.
+        """
+        th, tw = self.template.shape[:2]
+        if region_image is None or region_image.shape[0] < th or region_image.shape[1] < tw:
+            self.score = 0.0
+            return None
+
+        gray = cv2.cvtColor(region_image, cv2.COLOR_BGR2GRAY) if region_image.ndim == 3 else region_image
+        result = cv2.matchTemplate(gray, self.template, cv2.TM_CCOEFF_NORMED)
+        _, self.score, _, (mx, my) = cv2.minMaxLoc(result)
+        if not self.score >= self.min_score:  # also catches NaN from flat templates
+            return None
+
+        w, h = self.box[2] - self.box[0], self.box[3] - self.box[1]
+        x1 = region_origin[0] + mx - self.inset
+        y1 = region_origin[1] + my - self.inset
+        self.box = [x1, y1, x1 + w, y1 + h]
+        return list(self.box)
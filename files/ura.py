@@ -1,12 +1,14 @@
+import time
+_start_time = time.perf_counter()  # for --startup-time
+
 import sys
 import os
 import subprocess
-import win32gui
-import win32con
+import threading
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QScrollArea, QFrame
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton
 )
-from PyQt5.QtCore import Qt, QPropertyAnimation
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont
 
 # -------------------------
@@ -25,102 +27,266 @@ def resource_path(relative_path):
 # -------------------------
 # Local imports
 # -------------------------
-from screen_capture import capture_word_window
-from roboflow_detect import detect_objects
-from overlay import Overlay
-from llm_engine import SmartLLMEngine  # ✅ Use your new LLM engine
+# Only light modules here; cv2/numpy/PIL, the detector and the LLM engine
+# are loaded on first use (normally by the warm-up right after first paint).
+from pipeline import AssistantPipeline, CancelToken, Cancelled
+from chat_log import ChatHistory, ChatView
+from window_provider import get_window_provider
+import model_manager
+import tracing
 
 
 # -------------------------
 # Word handling
 # -------------------------
-word_hwnd_cache = None
-
 def get_word_hwnd():
-    global word_hwnd_cache
-    if word_hwnd_cache and win32gui.IsWindow(word_hwnd_cache):
-        return word_hwnd_cache
-    hwnd_found = None
-    def enum_handler(hwnd, _):
-        nonlocal hwnd_found
-        title = win32gui.GetWindowText(hwnd)
-        if "Word" in title and win32gui.IsWindowVisible(hwnd):
-            hwnd_found = hwnd
-            return False
-        return True
-    win32gui.EnumWindows(lambda hwnd, _: enum_handler(hwnd, None), None)
-    word_hwnd_cache = hwnd_found
-    return hwnd_found
-
-def bring_word_front_and_fullscreen(hwnd):
-    if not hwnd:
-        return
-    try:
-        foreground = win32gui.GetForegroundWindow()
-        placement = win32gui.GetWindowPlacement(hwnd)
-        show_cmd = placement[1]
-        if hwnd == foreground and show_cmd == win32con.SW_SHOWMAXIMIZED:
-            return
-        if show_cmd == win32con.SW_SHOWMINIMIZED:
-            win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-            win32gui.ShowWindow(hwnd, win32con.SW_MAXIMIZE)
-            win32gui.SetForegroundWindow(hwnd)
-            return
-        if hwnd != foreground:
-            win32gui.SetForegroundWindow(hwnd)
-            if show_cmd != win32con.SW_SHOWMAXIMIZED:
-                win32gui.ShowWindow(hwnd, win32con.SW_MAXIMIZE)
-            return
-        if hwnd == foreground and show_cmd == win32con.SW_SHOWNORMAL:
-            win32gui.ShowWindow(hwnd, win32con.SW_MAXIMIZE)
-    except Exception as e:
-        print("Error bringing Word to front:", e)
+    # Word windows are tracked by process and class from window events
+    return get_window_provider().find_target()
+
+
+def word_window_state(hwnd):
+    # (in front?, rect) for the speculative capture to wait until bring_to_front is done
+    windows = get_window_provider()
+    return windows.foreground() == hwnd, windows.get_rect(hwnd)
 
 # -------------------------
-# Initialize Smart LLM Engine
+# Lazily created services
 # -------------------------
-llm_engine = SmartLLMEngine(model_name="gemma:2b", label_list_path=resource_path("label_mapping.txt"))
+llm_engine = None
+detection_cache = None
+screenshot_archive = None
+_engine_lock = threading.Lock()
+_detection_cache_lock = threading.Lock()
+_archive_lock = threading.Lock()
+
+def get_llm_engine():
+    global llm_engine
+    with _engine_lock:
+        if llm_engine is None:
+            from llm_engine import SmartLLMEngine
+            from ollama_client import default_client
+            from query_cache import QueryCache
+            client = default_client()
+            query_cache = QueryCache(path=os.path.join(os.getcwd(), "cache", "queries.sqlite3"))
+
+            # URA_MATCHER=semantic|hybrid adds the embedding matcher; URA_EMBED_MODEL
+            # swaps the offline hashed embedder for an Ollama embedding model
+            embedder = None
+            if os.environ.get("URA_EMBED_MODEL"):
+                from semantic_matcher import OllamaEmbedder
+                embedder = OllamaEmbedder(client, model=os.environ["URA_EMBED_MODEL"])
+
+            llm_engine = SmartLLMEngine(model_name="gemma:2b", label_list_path=resource_path("label_mapping.txt"),
+                                        client=client, cache=query_cache,
+                                        matcher=os.environ.get("URA_MATCHER", "lexical"), embedder=embedder,
+                                        vector_cache_dir=os.path.join(os.getcwd(), "cache"),
+                                        # Gemma calls allowed at once (URA_LLM_CONCURRENCY, default 1)
+                                        max_concurrent=int(os.environ.get("URA_LLM_CONCURRENCY", "1")))
+        return llm_engine
+
+def get_detection_cache():
+    # Detections of recently seen ribbons, reused while Word looks the same
+    global detection_cache
+    with _detection_cache_lock:
+        if detection_cache is None:
+            from detection_cache import DetectionCache
+            detection_cache = DetectionCache()
+        return detection_cache
+
+def get_screenshot_archive():
+    # URA_SAVE_SCREENSHOTS=1 keeps the last URA_ARCHIVE_SIZE captures in screenshots/,
+    # as URA_ARCHIVE_FORMAT (jpg, webp, png, npy); URA_ARCHIVE_RIBBON=1 keeps only the ribbon
+    global screenshot_archive
+    if os.environ.get("URA_SAVE_SCREENSHOTS") != "1":
+        return None
+    with _archive_lock:
+        if screenshot_archive is None:
+            from screenshot_archive import ScreenshotArchive
+            screenshot_archive = ScreenshotArchive(
+                os.path.join(os.getcwd(), "screenshots"),
+                capacity=int(os.environ.get("URA_ARCHIVE_SIZE", "200")),
+                encoding=os.environ.get("URA_ARCHIVE_FORMAT", "jpg"),
+                ribbon_only=os.environ.get("URA_ARCHIVE_RIBBON") == "1",
+            )
+        return screenshot_archive
+
+def detect_in_frame(frame, labels):
+    from roboflow_detect import detect_objects
+    # A ribbon-only grab is already the region of interest
+    return detect_objects(frame, save_annotated_path=None, filter_labels=labels, cache=get_detection_cache(),
+                          roi=not frame.partial, tile=os.environ.get("URA_DETECT_TILES") == "1")
+
+class LazyEngine:
+    """Stands in for SmartLLMEngine; builds the real one on the first query."""
+
+    def query(self, user_text):
+        return get_llm_engine().query(user_text)
+
+def warm_up(report):
+    """
+    Load everything the first query needs: Word window tracking, label
+    index, capture/detection modules, detector backend and the Gemma
+    model. Returns False if any part failed (queries will then retry it
+    when they need it).
+    """
+    ok = True
+    report("finding Word")
+    try:
+        get_window_provider()
+    except Exception as e:
+        print("❌ Window tracking failed to start:", e)
+        ok = False
+
+    report("loading labels")
+    try:
+        engine = get_llm_engine()
+    except Exception as e:
+        print("❌ Label index failed to load:", e)
+        engine = None
+        ok = False
+
+    report("loading detector")
+    try:
+        import screen_capture  # noqa: F401  (cv2, numpy)
+        from capture_backends import get_capture_backend
+        get_capture_backend()
+        from detector_backends import get_backend
+        get_detection_cache()
+        get_backend()
+    except Exception as e:
+        print("❌ Detector warm-up failed:", e)
+        ok = False
+
+    if engine is None:
+        return False
+    report("loading Gemma")
+    try:
+        if not engine.warm():
+            print("❌ Gemma warm-up failed:", engine.model.detail)
+            ok = False
+    except Exception as e:
+        print("❌ Gemma warm-up failed:", e)
+        ok = False
+    # Reloads the model if Ollama unloads it, retries it if it is down
+    engine.model.start_keep_alive()
+    return ok
+
+class WarmupSignals(QObject):
+    status = pyqtSignal(str)
+    ready = pyqtSignal(bool)
+
+class WarmupWorker(QRunnable):
+    def __init__(self):
+        super().__init__()
+        self.signals = WarmupSignals()
+
+    def run(self):
+        try:
+            ok = warm_up(self.signals.status.emit)
+        except Exception as e:
+            print("❌ Warm-up failed:", e)
+            ok = False
+        self.signals.ready.emit(ok)
 
 # -------------------------
-# Chat bubble
+# Background query worker
 # -------------------------
-class ChatBubble(QFrame):
-    def __init__(self, text, is_user=False):
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int, str)      # job id, bubble text
+    finished = pyqtSignal(int, object)   # job id, pipeline result
+
+
+class QueryWorker(QRunnable):
+    """
+    Runs one AssistantPipeline query on a QThreadPool thread. With `label`,
+    skips the LLM and only locates that label again (re-detection).
+    """
+
+    def __init__(self, job_id, pipeline, user_query, hwnd, token, label=None):
         super().__init__()
-        self.setObjectName("bubble")
-        self.setStyleSheet("""
-            QFrame#bubble {
-                border-radius: 12px;
-                padding: 8px;
-                margin: 6px;
-            }
-        """)
-        layout = QHBoxLayout()
-        label = QLabel(text)
-        label.setWordWrap(True)
-        label.setFont(QFont("Segoe UI", 10))
-        label.setTextInteractionFlags(Qt.TextSelectableByMouse | Qt.TextSelectableByKeyboard)
-
-        if is_user:
-            self.setStyleSheet(self.styleSheet() + "QFrame#bubble { background: #4b6ef6; color: white; margin-left: 80px; }")
-            layout.addStretch()
-            layout.addWidget(label)
-        else:
-            self.setStyleSheet(self.styleSheet() + "QFrame#bubble { background: #2e2e2e; color: #eaeaea; margin-right: 80px; }")
-            layout.addWidget(label)
-            layout.addStretch()
+        self.job_id = job_id
+        self.pipeline = pipeline
+        self.user_query = user_query
+        self.hwnd = hwnd
+        self.token = token
+        self.label = label
+        self.signals = WorkerSignals()
+
+    def run(self):
+        def report(text):
+            if not self.token.cancelled:
+                self.signals.progress.emit(self.job_id, text)
+
+        trace = None
+        try:
+            if self.label:
+                with tracing.start_trace("redetect", label=self.label) as trace:
+                    result = self.pipeline.locate(self.label, self.hwnd, self.token)
+            else:
+                with tracing.start_trace("query", text=self.user_query) as trace:
+                    result = self.pipeline.run(self.user_query, self.hwnd, self.token, report)
+        except Cancelled:
+            return
+        except Exception as e:
+            print("❌ Query pipeline error:", e)
+            result = {"message": f"❌ Something went wrong: {e}"}
 
-        self.setLayout(layout)
+        if trace is not None:
+            result["trace"] = trace.breakdown()
+
+        if not self.token.cancelled:
+            self.signals.finished.emit(self.job_id, result)
+
+
+class WindowHider(QObject):
+    """Lets a worker thread hide/show the chat window on the GUI thread and wait for it."""
+    hide_requested = pyqtSignal()
+    show_requested = pyqtSignal()
+
+    def __init__(self, widget):
+        super().__init__()
+        self.hide_requested.connect(widget.hide, Qt.BlockingQueuedConnection)
+        self.show_requested.connect(widget.show, Qt.BlockingQueuedConnection)
 
 # -------------------------
 # Main Chat Window
 # -------------------------
 class ChatWindow(QWidget):
+    first_painted = pyqtSignal()
+    warmed_up = pyqtSignal(bool)
+    model_status = pyqtSignal(str, str)  # Gemma health state, detail
+
     def __init__(self):
         super().__init__()
         self._drag_active = False
         self._drag_position = None
         self.overlay = None
+        self._painted = False
+        self.ready = False
+
+        # Queries run off the GUI thread; a new one cancels the previous
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(4)
+        self._job_id = 0
+        self._job_token = None
+        self._job_hwnd = None
+        self._hider = WindowHider(self)
+        self._excluded = False  # set once the OS keeps us out of screenshots
+        # URA_CAPTURE_RIBBON=1 grabs only the top of the Word window
+        self._capture_fraction = 0.35 if os.environ.get("URA_CAPTURE_RIBBON") == "1" else None
+
+        # Keep the highlight on its button with template matching (URA_TRACKING=0 to disable)
+        self._tracking = os.environ.get("URA_TRACKING", "1") == "1"
+        self._tracker = None
+        self._redetects = 0
+        self.pipeline = AssistantPipeline(
+            engine=LazyEngine(),
+            capture=self._capture_without_self,
+            detect=detect_in_frame,
+            # Capture and detect while the label is resolved (URA_SPECULATIVE=0 to disable)
+            speculative=os.environ.get("URA_SPECULATIVE", "1") == "1",
+            window_state=word_window_state,
+        )
 
         self.setWindowTitle("AI Office Tutor")
         self.resize(400, 650)
@@ -135,7 +301,69 @@ class ChatWindow(QWidget):
         # Position bottom-right
         screen_geom = QApplication.desktop().availableGeometry()
         self.move(screen_geom.width() - self.width() - 10, screen_geom.height() - self.height() - 70)
-        
+
+        # Heavy loading starts only once the window is on screen
+        self.first_painted.connect(self.start_warmup)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            QTimer.singleShot(0, self.first_painted.emit)
+
+    def start_warmup(self):
+        worker = WarmupWorker()
+        worker.signals.status.connect(lambda text: self.set_status(f"● {text}…", "#f59e0b"))
+        worker.signals.ready.connect(self.on_warmed_up)
+        self._pool.start(worker)
+
+    def on_warmed_up(self, ok):
+        self.ready = True
+        try:
+            from screen_capture import exclude_from_capture
+            self._excluded = exclude_from_capture(self)
+        except Exception as e:
+            print("❌ Could not exclude the chat window from capture:", e)
+        try:
+            self.pipeline.archive = get_screenshot_archive()
+        except Exception as e:
+            print("❌ Screenshot archive unavailable:", e)
+        self._warm_ok = ok
+        self._show_ready_status()
+
+        # Gemma health changes arrive from the keep-alive thread and from queries.
+        # Only if warm-up built the engine: building it here would block the GUI thread
+        if llm_engine is None:
+            self.warmed_up.emit(ok)
+            return
+        model = llm_engine.model
+        self.model_status.connect(self.on_model_status)
+        model.subscribe(self.model_status.emit)
+        if model.state in (model_manager.DEGRADED, model_manager.UNAVAILABLE):
+            self.on_model_status(model.state, model.detail)
+        self.warmed_up.emit(ok)
+
+    def on_model_status(self, state, detail):
+        if state == model_manager.READY:
+            self._show_ready_status()
+        elif state == model_manager.LOADING:
+            self.set_status("● reloading Gemma…", "#f59e0b")
+        elif state == model_manager.DEGRADED:
+            self.set_status("● Gemma is slow or failing", "#f59e0b")
+        else:
+            self.set_status("● Gemma offline, using keyword matching", "#ef4444")
+        self.status_label.setToolTip(detail)
+
+    def _show_ready_status(self):
+        if self._warm_ok:
+            self.set_status("● ready", "#22c55e")
+        else:
+            self.set_status("● ready (some parts failed to load)", "#ef4444")
+
+    def set_status(self, text, color):
+        self.status_label.setText(text)
+        self.status_label.setStyleSheet(f"color: {color};")
+
     def resizeEvent(self, event):
         self.container.setGeometry(0, 0, self.width(), self.height())
         super().resizeEvent(event)
@@ -165,6 +393,10 @@ class ChatWindow(QWidget):
         title_label.setFont(QFont("Segoe UI", 12, QFont.Bold))
         title_label.setStyleSheet("color: white;")
         title_layout.addWidget(title_label)
+        self.status_label = QLabel("")
+        self.status_label.setFont(QFont("Segoe UI", 8))
+        self.set_status("● starting…", "#f59e0b")
+        title_layout.addWidget(self.status_label)
         title_layout.addStretch()
 
         min_btn = QPushButton("-")
@@ -181,14 +413,21 @@ class ChatWindow(QWidget):
 
         main_layout.addLayout(title_layout)
 
-        self.scroll = QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.scroll_widget = QWidget()
-        self.scroll_layout = QVBoxLayout(self.scroll_widget)
-        self.scroll_layout.addStretch()
-        self.scroll.setWidget(self.scroll_widget)
-        self.scroll.setStyleSheet("background: transparent; border: none;")
-        main_layout.addWidget(self.scroll)
+        # Debug HUD with the last query's stage timings (URA_DEBUG_HUD=1)
+        self.hud = QLabel("")
+        self.hud.setFont(QFont("Consolas", 8))
+        self.hud.setStyleSheet("color:#9ca3af; padding:0 10px;")
+        self._hud_enabled = os.environ.get("URA_DEBUG_HUD") == "1"
+        self.hud.setVisible(self._hud_enabled)
+        if self._hud_enabled and not tracing.enabled():
+            tracing.configure(True)
+        main_layout.addWidget(self.hud)
+
+        # Older messages beyond the cap are moved to cache/chat_history.jsonl
+        self.history = ChatHistory(max_messages=1000,
+                                   spill_path=os.path.join(os.getcwd(), "cache", "chat_history.jsonl"))
+        self.chat_view = ChatView(self.history)
+        main_layout.addWidget(self.chat_view)
 
         input_row = QHBoxLayout()
         self.input_box = QLineEdit()
@@ -205,19 +444,7 @@ class ChatWindow(QWidget):
         main_layout.addLayout(input_row)
 
     def add_bubble(self, text, is_user=False):
-        bubble = ChatBubble(text, is_user=is_user)
-        self.scroll_layout.insertWidget(self.scroll_layout.count()-1, bubble)
-        QApplication.processEvents()
-        scroll_bar = self.scroll.verticalScrollBar()
-        scroll_bar.setValue(scroll_bar.maximum())
-        start_value = scroll_bar.value()
-        end_value = scroll_bar.maximum()
-        anim = QPropertyAnimation(scroll_bar, b"value", self)
-        anim.setDuration(600)
-        anim.setStartValue(start_value)
-        anim.setEndValue(end_value)
-        anim.start()
-        self._scroll_anim = anim
+        self.history.append(text, is_user=is_user)
 
     def on_send(self):
         user_query = self.input_box.text().strip()
@@ -231,43 +458,88 @@ class ChatWindow(QWidget):
             self.add_bubble("⚠️ No Word window found! Please open Word first.", False)
             return
 
-        bring_word_front_and_fullscreen(hwnd)
-
-        response = llm_engine.query(user_query)
-        label_name = response.get("label")
-        intent = response.get("intent", user_query)
-        self.add_bubble(f"🧠 Intent: {intent}\n🔗 Label: {label_name}\n")
-
-        if not label_name:
-            self.add_bubble("⚠️ I couldn’t map this to a feature.", False)
+        get_window_provider().bring_to_front(hwnd)
+        self._redetects = 0
+        self._start_job(hwnd, user_query=user_query)
+
+    def _start_job(self, hwnd, user_query=None, label=None):
+        # A newer question makes any query still in flight stale
+        if self._job_token:
+            self._job_token.cancel()
+        self._job_id += 1
+        self._job_token = CancelToken()
+        self._job_hwnd = hwnd
+
+        worker = QueryWorker(self._job_id, self.pipeline, user_query, hwnd, self._job_token, label=label)
+        worker.signals.progress.connect(self.on_query_progress)
+        worker.signals.finished.connect(self.on_query_finished)
+        self._pool.start(worker)
+
+    def on_query_progress(self, job_id, text):
+        if job_id == self._job_id:
+            self.add_bubble(text)
+
+    def on_query_finished(self, job_id, result):
+        if job_id != self._job_id:
             return
+        self._job_token = None
 
-        # ✅ Save screenshots safely beside EXE
-        screenshot_dir = os.path.join(os.getcwd(), "screenshots")
-        os.makedirs(screenshot_dir, exist_ok=True)
-        captured_image_path = os.path.join(screenshot_dir, "latest_word.png")
+        if "trace" in result and self._hud_enabled:
+            self.hud.setText("  ".join(f"{name} {ms:.0f}ms" for name, ms in result["trace"].items()))
 
-        captured = capture_word_window(hwnd, filename=captured_image_path, exclude_widget=self)
-        if not captured:
-            self.add_bubble("❌ Failed to capture Word window.", False)
+        if "message" in result:
+            self.add_bubble(result["message"], False)
             return
 
-        detections = detect_objects(captured_image_path, save_annotated_path=None, filter_labels=[label_name])
-        if not detections:
-            self.add_bubble(f"ℹ️ No '{label_name}' detected.", False)
+        self._stop_tracking()
+        if self.overlay is None:
+            # One overlay for the whole session; it keeps its paint resources
+            from overlay import Overlay
+            self.overlay = Overlay()
+        self.overlay.set_target(self._job_hwnd)
+        boxes = [[*d['box'], d['label']] for d in result["detections"]]
+        # While tracking, hold the highlight longer before it fades
+        self.overlay.set_boxes(boxes, frame=result["frame"], fade_after=10000 if self._tracking else 2000)
+        self.overlay.show_forever()
+        if self._tracking:
+            self._start_tracking(result)
+
+    def _start_tracking(self, result):
+        from overlay import OverlayTracker
+        from tracker import TemplateTracker
+        image = result["frame"].image
+        trackers = [TemplateTracker(image, d['box']) for d in result["detections"]]
+        self._tracker = OverlayTracker(self.overlay, trackers)
+        # A highlighted tab header changes when it is clicked; then look for the button on it
+        label = result.get("pending_label", result["label"])
+        self._tracker.lost.connect(lambda: self.on_track_lost(label))
+        self._tracker.start()
+
+    def _stop_tracking(self):
+        if self._tracker:
+            self._tracker.stop()
+            self._tracker = None
+
+    def on_track_lost(self, label):
+        # The button moved too far or changed; run the full detector again
+        if self._redetects >= 3 or not self._job_hwnd:
             return
+        self._redetects += 1
+        self._start_job(self._job_hwnd, label=label)
 
-        if self.overlay:
-            self.overlay.hide_overlay()
-            self.overlay = None
+    def _capture_without_self(self, hwnd):
+        from capture_backends import get_capture_backend
+        from screen_capture import grab_word_frame
+        backend = get_capture_backend()
+        if self._excluded or backend.excludes_layered:
+            return grab_word_frame(hwnd, top_fraction=self._capture_fraction, backend=backend)
 
-        self.overlay = Overlay(target_hwnd=hwnd)
-        boxes = [[*d['box'], d['label']] for d in detections]
-
-        import cv2
-        img = cv2.imread(captured_image_path)
-        self.overlay.set_boxes(boxes, img_size=(img.shape[1], img.shape[0]))
-        self.overlay.show_forever()
+        # Called on the worker thread; hide/show must happen on the GUI thread
+        self._hider.hide_requested.emit()
+        try:
+            return grab_word_frame(hwnd, top_fraction=self._capture_fraction, backend=backend)
+        finally:
+            self._hider.show_requested.emit()
 
 
 if __name__ == "__main__":
@@ -286,5 +558,15 @@ if __name__ == "__main__":
 
     w.add_bubble(about_message, is_user=False)
 
+    # --startup-time: report time to first paint and to ready, then exit
+    if "--startup-time" in sys.argv:
+        def report_paint():
+            print(f"first paint: {(time.perf_counter() - _start_time) * 1000:.0f} ms")
+        def report_ready(ok):
+            print(f"ready: {(time.perf_counter() - _start_time) * 1000:.0f} ms (ok={ok})")
+            app.quit()
+        w.first_painted.connect(report_paint)
+        w.warmed_up.connect(report_ready)
+
     w.show()
     sys.exit(app.exec_())
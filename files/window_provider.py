@@ -0,0 +1,456 @@
+"""
+Where the target Office window is, without scanning for it on every query.
+
+A WindowProvider keeps a registry of candidate windows, matched by process
+image and window class (not by title), and updates it from window events:
+created, destroyed, shown/hidden, moved/resized, retitled and activated.
+
+    windows = get_window_provider()
+    hwnd = windows.find_target()
+    rect = windows.get_rect(hwnd)
+    windows.subscribe(lambda event, info: ...)  # called on the event thread
+
+URA_WINDOW_PROVIDER=fake selects the in-memory provider (the default on
+anything but Windows), so the whole flow runs on Linux.
+"""
+import os
+import sys
+import threading
+import time
+
+# Window events passed to subscribers
+CREATED = "created"
+DESTROYED = "destroyed"
+SHOWN = "shown"
+HIDDEN = "hidden"
+MOVED = "moved"
+RETITLED = "retitled"
+ACTIVATED = "activated"
+
+WORD_PROCESSES = ("WINWORD.EXE",)
+WORD_CLASSES = ("OpusApp",)
+
+
+class WindowInfo:
+    """One tracked top-level window. `rect` is (left, top, right, bottom) in screen pixels."""
+
+    def __init__(self, hwnd, rect=(0, 0, 0, 0), title="", process="", class_name="", visible=True, pid=0):
+        self.hwnd = hwnd
+        self.pid = pid
+        self.rect = rect
+        self.title = title
+        self.process = process
+        self.class_name = class_name
+        self.visible = visible
+        self.last_active = 0.0
+
+    def __repr__(self):
+        return f"WindowInfo({self.hwnd}, {self.class_name!r}, {self.process!r}, {self.title!r}, {self.rect})"
+
+
+# -------------------------
+# Base provider
+# -------------------------
+class WindowProvider:
+    """Registry of candidate windows; subclasses feed it window events."""
+
+    def __init__(self, process_names=WORD_PROCESSES, class_names=WORD_CLASSES):
+        self.process_names = {p.upper() for p in process_names}
+        self.class_names = set(class_names)
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def matches(self, process, class_name):
+        return class_name in self.class_names and os.path.basename(process).upper() in self.process_names
+
+    def windows(self):
+        with self._lock:
+            return list(self._windows.values())
+
+    def find_target(self):
+        """The visible candidate that was active most recently, or None."""
+        with self._lock:
+            visible = [w for w in self._windows.values() if w.visible]
+        if not visible:
+            return None
+        return max(visible, key=lambda w: w.last_active).hwnd
+
+    def get_rect(self, hwnd):
+        with self._lock:
+            info = self._windows.get(hwnd)
+        return info.rect if info else None
+
+    def is_window(self, hwnd):
+        with self._lock:
+            return hwnd in self._windows
+
+    def foreground(self):
+        """The window that has the focus right now."""
+        return self.find_target()
+
+    def bring_to_front(self, hwnd):
+        """Activate and maximize the window."""
+        raise NotImplementedError
+
+    def subscribe(self, callback):
+        """callback(event, WindowInfo); runs on the provider's event thread."""
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _emit(self, event, info):
+        for callback in list(self._listeners):
+            try:
+                callback(event, info)
+            except Exception as e:
+                print("❌ Window event listener failed:", e)
+
+    # Registry updates shared by the providers
+    def _add(self, info):
+        with self._lock:
+            self._windows[info.hwnd] = info
+        self._emit(CREATED, info)
+
+    def _remove(self, hwnd):
+        with self._lock:
+            info = self._windows.pop(hwnd, None)
+        if info:
+            self._emit(DESTROYED, info)
+
+    def _update(self, hwnd, event, **fields):
+        with self._lock:
+            info = self._windows.get(hwnd)
+            if info is None:
+                return
+            for name, value in fields.items():
+                setattr(info, name, value)
+        self._emit(event, info)
+
+
+# -------------------------
+# Fake provider
+# -------------------------
+class FakeWindowProvider(WindowProvider):
+    """
+    In-memory windows for tests, benchmarks and non-Windows machines.
+    Windows are added, moved, retitled and closed by calling its methods;
+    non-matching windows (say a browser titled "Word") are ignored the same
+    way the Win32 provider ignores them.
+    """
+
+    def __init__(self, process_names=WORD_PROCESSES, class_names=WORD_CLASSES):
+        super().__init__(process_names, class_names)
+        self.activations = []
+        self._next_hwnd = 0x1000
+
+    def add_window(self, rect=(0, 0, 1920, 1040), title="Document1 - Word", process="WINWORD.EXE",
+                   class_name="OpusApp", hwnd=None, visible=True):
+        """Open a window; returns its hwnd (tracked only if it matches)."""
+        if hwnd is None:
+            self._next_hwnd += 4
+            hwnd = self._next_hwnd
+        if self.matches(process, class_name):
+            info = WindowInfo(hwnd, tuple(rect), title, process, class_name, visible)
+            info.last_active = time.monotonic()
+            self._add(info)
+        return hwnd
+
+    def close_window(self, hwnd):
+        self._remove(hwnd)
+
+    def move_window(self, hwnd, rect):
+        self._update(hwnd, MOVED, rect=tuple(rect))
+
+    def set_title(self, hwnd, title):
+        self._update(hwnd, RETITLED, title=title)
+
+    def set_visible(self, hwnd, visible):
+        self._update(hwnd, SHOWN if visible else HIDDEN, visible=visible)
+
+    def bring_to_front(self, hwnd):
+        self.activations.append(hwnd)
+        self._update(hwnd, ACTIVATED, last_active=time.monotonic())
+
+
+# -------------------------
+# Win32 provider
+# -------------------------
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_SYSTEM_MINIMIZEEND = 0x0017
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+WM_QUIT = 0x0012
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+
+class Win32WindowProvider(WindowProvider):
+    """
+    Tracks Word windows with SetWinEventHook on a background thread. One
+    EnumWindows pass seeds the registry at start(); after that only events
+    for top-level windows touch it. A new window is matched on its class
+    first (cheap) and then on the process image name, which is cached per pid.
+
+    Only foreground and restore events are hooked system-wide. Object
+    events (create, show, hide, move, rename) fire constantly for carets,
+    cursors and controls in every app, so they are hooked per Word process:
+    for the processes found at start(), then for any new Word process as
+    soon as one of its windows comes to the foreground. A process is
+    unhooked when its last tracked window is destroyed.
+    """
+
+    # (first, last) event ranges; kept narrow so busy events like focus,
+    # selection and value changes are never delivered to Python
+    GLOBAL_HOOKS = (
+        (EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND),
+        (EVENT_SYSTEM_MINIMIZEEND, EVENT_SYSTEM_MINIMIZEEND),
+    )
+    PROCESS_HOOKS = (
+        (EVENT_OBJECT_CREATE, EVENT_OBJECT_HIDE),
+        (EVENT_OBJECT_LOCATIONCHANGE, EVENT_OBJECT_NAMECHANGE),
+    )
+
+    def __init__(self, process_names=WORD_PROCESSES, class_names=WORD_CLASSES):
+        super().__init__(process_names, class_names)
+        import win32gui
+        self._win32gui = win32gui
+        self._process_names = {}
+        self._process_hooks = {}  # pid -> hook handles; touched on the event thread only
+        self._callback = None
+        self._thread = None
+        self._thread_id = None
+        self._started = threading.Event()
+
+    # Window properties
+    @staticmethod
+    def _pid(hwnd):
+        import ctypes
+        from ctypes import wintypes
+        pid = wintypes.DWORD()
+        ctypes.windll.user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        return pid.value
+
+    def _process_name(self, pid):
+        import ctypes
+        from ctypes import wintypes
+        name = self._process_names.get(pid)
+        if name is None:
+            name = ""
+            handle = ctypes.windll.kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+            if handle:
+                buf = ctypes.create_unicode_buffer(1024)
+                size = wintypes.DWORD(len(buf))
+                if ctypes.windll.kernel32.QueryFullProcessImageNameW(handle, 0, buf, ctypes.byref(size)):
+                    name = buf.value
+                ctypes.windll.kernel32.CloseHandle(handle)
+            self._process_names[pid] = name
+        return name
+
+    def _inspect(self, hwnd):
+        """WindowInfo for `hwnd` if it is a candidate, else None."""
+        gui = self._win32gui
+        try:
+            class_name = gui.GetClassName(hwnd)
+            if class_name not in self.class_names or gui.GetParent(hwnd):
+                return None
+            pid = self._pid(hwnd)
+            process = self._process_name(pid)
+            if not self.matches(process, class_name):
+                return None
+            return WindowInfo(hwnd, gui.GetWindowRect(hwnd), gui.GetWindowText(hwnd), process,
+                              class_name, bool(gui.IsWindowVisible(hwnd)), pid=pid)
+        except Exception:
+            return None  # window vanished meanwhile
+
+    # Event thread
+    def start(self):
+        if self._thread:
+            return
+        gui = self._win32gui
+        foreground = gui.GetForegroundWindow()
+
+        def seed(hwnd, _):
+            info = self._inspect(hwnd)
+            if info:
+                info.last_active = time.monotonic() if hwnd == foreground else 0.0
+                self._add(info)
+            return True
+        gui.EnumWindows(seed, None)
+
+        self._thread = threading.Thread(target=self._run, name="window-events", daemon=True)
+        self._thread.start()
+        self._started.wait(2)
+
+    def stop(self):
+        if self._thread_id:
+            import ctypes
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+        self._thread = None
+
+    def _run(self):
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+
+        WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND, wintypes.LONG,
+                                          wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        self._callback = WinEventProc(self._on_event)  # referenced until the loop exits
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        hooks = [user32.SetWinEventHook(first, last, 0, self._callback, 0, 0,
+                                        WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS)
+                 for first, last in self.GLOBAL_HOOKS]
+        for pid in {info.pid for info in self.windows()}:
+            self._hook_process(pid)
+        self._started.set()
+
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+        for hook in hooks:
+            user32.UnhookWinEvent(hook)
+        for pid in list(self._process_hooks):
+            self._unhook_process(pid)
+        self._thread_id = None
+
+    def _hook_process(self, pid):
+        if not pid or pid in self._process_hooks:
+            return
+        import ctypes
+        user32 = ctypes.windll.user32
+        self._process_hooks[pid] = [user32.SetWinEventHook(first, last, 0, self._callback, pid, 0,
+                                                           WINEVENT_OUTOFCONTEXT)
+                                    for first, last in self.PROCESS_HOOKS]
+
+    def _unhook_process(self, pid):
+        import ctypes
+        for hook in self._process_hooks.pop(pid, ()):
+            ctypes.windll.user32.UnhookWinEvent(hook)
+
+    def _track(self, info, active):
+        info.last_active = time.monotonic() if active else 0.0
+        self._add(info)
+        self._hook_process(info.pid)
+
+    def _untrack(self, hwnd):
+        with self._lock:
+            info = self._windows.get(hwnd)
+        self._remove(hwnd)
+        if info and not any(w.pid == info.pid for w in self.windows()):
+            self._unhook_process(info.pid)
+
+    def _on_event(self, hook, event, hwnd, id_object, id_child, thread_id, event_time):
+        if id_object != OBJID_WINDOW or id_child != 0 or not hwnd:
+            return
+        try:
+            tracked = self.is_window(hwnd)
+            if event == EVENT_OBJECT_DESTROY:
+                self._untrack(hwnd)
+            elif not tracked:
+                if event in (EVENT_OBJECT_CREATE, EVENT_OBJECT_SHOW, EVENT_SYSTEM_FOREGROUND):
+                    # Foreground is how windows of a Word process we don't hook yet show up
+                    info = self._inspect(hwnd)
+                    if info:
+                        self._track(info, event == EVENT_SYSTEM_FOREGROUND)
+            elif event == EVENT_OBJECT_LOCATIONCHANGE:
+                self._update(hwnd, MOVED, rect=self._win32gui.GetWindowRect(hwnd))
+            elif event == EVENT_OBJECT_NAMECHANGE:
+                self._update(hwnd, RETITLED, title=self._win32gui.GetWindowText(hwnd))
+            elif event == EVENT_OBJECT_SHOW:
+                self._update(hwnd, SHOWN, visible=True)
+            elif event == EVENT_OBJECT_HIDE:
+                self._update(hwnd, HIDDEN, visible=False)
+            elif event in (EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_MINIMIZEEND):
+                self._update(hwnd, ACTIVATED, last_active=time.monotonic(),
+                             rect=self._win32gui.GetWindowRect(hwnd))
+        except Exception as e:
+            print("❌ Window event failed:", e)
+
+    def foreground(self):
+        return self._win32gui.GetForegroundWindow()
+
+    def get_rect(self, hwnd):
+        rect = super().get_rect(hwnd)
+        if rect is None:
+            # Not a tracked window (e.g. one of ours); ask directly
+            try:
+                rect = self._win32gui.GetWindowRect(hwnd)
+            except Exception:
+                return None
+        return rect
+
+    def bring_to_front(self, hwnd):
+        if not hwnd:
+            return
+        import win32con
+        gui = self._win32gui
+        try:
+            foreground = gui.GetForegroundWindow()
+            show_cmd = gui.GetWindowPlacement(hwnd)[1]
+            if hwnd == foreground and show_cmd == win32con.SW_SHOWMAXIMIZED:
+                return
+            if show_cmd == win32con.SW_SHOWMINIMIZED:
+                gui.ShowWindow(hwnd, win32con.SW_RESTORE)
+                gui.ShowWindow(hwnd, win32con.SW_MAXIMIZE)
+                gui.SetForegroundWindow(hwnd)
+                return
+            if hwnd != foreground:
+                gui.SetForegroundWindow(hwnd)
+                if show_cmd != win32con.SW_SHOWMAXIMIZED:
+                    gui.ShowWindow(hwnd, win32con.SW_MAXIMIZE)
+                return
+            if show_cmd == win32con.SW_SHOWNORMAL:
+                gui.ShowWindow(hwnd, win32con.SW_MAXIMIZE)
+        except Exception as e:
+            print("Error bringing Word to front:", e)
+
+
+# -------------------------
+# Shared provider
+# -------------------------
+PROVIDERS = {
+    "win32": Win32WindowProvider,
+    "fake": FakeWindowProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_window_provider(name=None):
+    """
+    The started, shared provider: `name`, else $URA_WINDOW_PROVIDER, else
+    "win32" on Windows and "fake" elsewhere.
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            name = name or os.environ.get("URA_WINDOW_PROVIDER") or ("win32" if sys.platform == "win32" else "fake")
+            if name not in PROVIDERS:
+                raise ValueError(f"Unknown window provider '{name}' (choose from {', '.join(PROVIDERS)})")
+            _provider = PROVIDERS[name]()
+            _provider.start()
+        return _provider
+
+
+def set_window_provider(provider):
+    """Use `provider` as the shared one (tests, benchmarks)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider